@@ -1,12 +1,22 @@
 import streamlit as st
-import folium
-from streamlit_folium import st_folium
-import plotly.graph_objects as go
+import streamlit.components.v1 as components
 import pandas as pd
 import numpy as np
 import sys
 import os
 import time
+import copy
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from streamlit.runtime.scriptrunner import (add_script_run_ctx,
+                                                get_script_run_ctx)
+except ImportError:
+    # Internal API; without it the prefetch worker just runs context-less
+    add_script_run_ctx = None
+    get_script_run_ctx = None
 
 def get_variable_label(variable):
     """Return Spanish label for variable"""
@@ -19,6 +29,18 @@ def get_variable_label(variable):
     }
     return labels.get(variable, 'Variable')
 
+# Variable tiles as immutable (key, icon, label) records with O(1) lookups,
+# built once at module level instead of per rerun
+VAR_SPECS = (
+    ("risk_index", "🔥", "Índice de Riesgo"),
+    ("temperature", "🌡️", "Temperatura"),
+    ("relative_humidity", "💧", "Humedad Relativa"),
+    ("solar_radiation", "☀️", "Radiación Solar"),
+    ("wind_speed", "💨", "Velocidad de Viento"),
+)
+KEY_TO_LABEL = {key: label for key, _, label in VAR_SPECS}
+LABEL_TO_KEY = {label: key for key, _, label in VAR_SPECS}
+
 
 # ---- ENVIRONMENT CONFIGURATION ----
 os.environ['HDF5_USE_FILE_LOCKING'] = 'FALSE'
@@ -43,33 +65,28 @@ def reset_animation(available, selected_year):
             st.session_state.sel_month = min(months_for_year)
     st.session_state.playing = False
 
-def next_month_animation(available, selected_year):
-    """Advance to next month"""
+def next_month_animation(available, month_idx, selected_year):
+    """Advance to next month (O(1) index lookup)"""
     if "sel_month" in st.session_state and selected_year in available:
         months_for_year = available[selected_year]
-        try:
-            current_idx = months_for_year.index(st.session_state.sel_month)
-            
-            if current_idx < len(months_for_year) - 1:
-                st.session_state.sel_month = months_for_year[current_idx + 1]
-            elif st.session_state.loop_animation:
-                st.session_state.sel_month = months_for_year[0]
-            else:
-                st.session_state.playing = False
-        except ValueError:
-            pass
-
-def prev_month_animation(available, selected_year):
-    """Go to previous month"""
+        current_idx = month_idx[selected_year].get(st.session_state.sel_month)
+        if current_idx is None:
+            return
+
+        n = len(months_for_year)
+        if st.session_state.loop_animation:
+            st.session_state.sel_month = months_for_year[(current_idx + 1) % n]
+        elif current_idx < n - 1:
+            st.session_state.sel_month = months_for_year[current_idx + 1]
+        else:
+            st.session_state.playing = False
+
+def prev_month_animation(available, month_idx, selected_year):
+    """Go to previous month (O(1) index lookup)"""
     if "sel_month" in st.session_state and selected_year in available:
-        months_for_year = available[selected_year]
-        try:
-            current_idx = months_for_year.index(st.session_state.sel_month)
-            
-            if current_idx > 0:
-                st.session_state.sel_month = months_for_year[current_idx - 1]
-        except ValueError:
-            pass
+        current_idx = month_idx[selected_year].get(st.session_state.sel_month)
+        if current_idx is not None and current_idx > 0:
+            st.session_state.sel_month = available[selected_year][current_idx - 1]
 
 # ---- PAGE CONFIG & STYLE ----
 st.set_page_config(
@@ -160,6 +177,9 @@ fires_data = load_fire_data_cached()
 try:
     available = dp.get_available_year_months(ds)
     all_years = sorted(available.keys())
+
+    # O(1) month -> position lookup for the animation controls
+    month_idx = {y: {m: i for i, m in enumerate(ms)} for y, ms in available.items()}
     
     if not all_years:
         st.error("No hay datos temporales disponibles en el dataset")
@@ -170,7 +190,7 @@ except Exception as e:
     st.stop()
 
 # ---- CALCULATE GLOBAL THRESHOLD (once at startup) ----
-@st.cache_data(show_spinner="Calculando umbral global de riesgo...")
+@st.cache_data(show_spinner="Calculando umbral global de riesgo...", persist="disk")
 def get_global_threshold(_ds, date_key):
     """Calculate global threshold once and cache it"""
     return rc.calculate_global_threshold(_ds, date_key)
@@ -192,36 +212,15 @@ st.sidebar.markdown("### Variable a Visualizar")
 if 'selected_variable' not in st.session_state:
     st.session_state.selected_variable = "risk_index"
 
-# Keep the original simple structure for variable_options
-variable_options = {
-    "Índice de Riesgo": "risk_index",
-    "Temperatura": "temperature",
-    "Humedad Relativa": "relative_humidity",
-    "Radiación Solar": "solar_radiation",
-    "Velocidad de Viento": "wind_speed"
-}
-
-# Icons for each variable
-variable_icons = {
-    "Índice de Riesgo": "🔥",
-    "Temperatura": "🌡️",
-    "Humedad Relativa": "💧",
-    "Radiación Solar": "☀️",
-    "Velocidad de Viento": "💨"
-}
-
 # Create vertical button tiles
-for var_name, var_key in variable_options.items():
+for var_key, icon, var_name in VAR_SPECS:
     is_selected = st.session_state.selected_variable == var_key
-    
+
     # Use Streamlit's native button with custom styling
     button_type = "primary" if is_selected else "secondary"
-    
-    # Create custom button label with icon
-    button_label = f"{variable_icons[var_name]} {var_name}"
-    
+
     if st.sidebar.button(
-        button_label,
+        f"{icon} {var_name}",
         key=f"var_{var_key}",
         use_container_width=True,
         type=button_type
@@ -230,7 +229,7 @@ for var_name, var_key in variable_options.items():
         # st.rerun()
 
 # Get the display name for selected variable (for use in rest of code)
-selected_var = [k for k, v in variable_options.items() if v == st.session_state.selected_variable][0]
+selected_var = KEY_TO_LABEL[st.session_state.selected_variable]
 
 # ---- YEAR SELECTION ----
 st.sidebar.markdown("---")
@@ -295,28 +294,39 @@ with col_reset:
 col_prev, col_next = st.sidebar.columns(2)
 with col_prev:
     if st.sidebar.button("◀️ Anterior", key="prev_btn", use_container_width=True):
-        prev_month_animation(available, selected_year)
+        prev_month_animation(available, month_idx, selected_year)
         st.session_state.playing = False
 
 with col_next:
     if st.sidebar.button("▶️ Siguiente", key="next_btn", use_container_width=True):
-        next_month_animation(available, selected_year)
+        next_month_animation(available, month_idx, selected_year)
         st.session_state.playing = False
 
-st.session_state.animation_speed = st.sidebar.slider(
-    "Velocidad (seg/mes)",
-    min_value=0.1,
-    max_value=3.0,
-    value=st.session_state.animation_speed,
-    step=0.1,
-    help="Tiempo que se muestra cada mes durante la animación"
-)
+@st.fragment
+def render_animation_settings():
+    """Speed/loop widgets batched in a form; one rerun per apply click"""
+    with st.form("animation_controls"):
+        speed = st.slider(
+            "Velocidad (seg/mes)",
+            min_value=0.1,
+            max_value=3.0,
+            value=st.session_state.animation_speed,
+            step=0.1,
+            help="Tiempo que se muestra cada mes durante la animación"
+        )
 
-st.session_state.loop_animation = st.sidebar.checkbox(
-    "Repetir animación",
-    value=st.session_state.loop_animation,
-    help="Volver a empezar automáticamente al llegar al último mes"
-)
+        loop = st.checkbox(
+            "Repetir animación",
+            value=st.session_state.loop_animation,
+            help="Volver a empezar automáticamente al llegar al último mes"
+        )
+
+        if st.form_submit_button("Aplicar", use_container_width=True):
+            st.session_state.animation_speed = speed
+            st.session_state.loop_animation = loop
+
+with st.sidebar:
+    render_animation_settings()
 
 # ---- GLOBAL THRESHOLD INFO ----
 st.sidebar.markdown("---")
@@ -326,14 +336,16 @@ else:
     st.sidebar.warning("⚠️ No se pudo calcular umbral global")
 
 # ---- FIND AVAILABLE DATES ----
-date_key = "time" if "time" in ds.coords else "valid_time"
-candidate_dates = pd.to_datetime(ds[date_key].values)
-nearest = candidate_dates[(candidate_dates.year == selected_year) & (candidate_dates.month == sel_month)]
+@st.cache_resource(show_spinner=False)
+def get_time_index(_ds, date_key):
+    """Cache the decoded time axis plus compact year/month arrays for masking"""
+    dates = pd.to_datetime(_ds[date_key].values)
+    return dates, dates.year.values.astype(np.int16), dates.month.values.astype(np.int8)
 
-if len(nearest) > 0:
-    chosen_date = nearest[0]
-else:
-    chosen_date = candidate_dates[0]
+date_key = "time" if "time" in ds.coords else "valid_time"
+candidate_dates, year_arr, month_arr = get_time_index(ds, date_key)
+nearest_idx = np.flatnonzero((year_arr == selected_year) & (month_arr == sel_month))
+chosen_date = candidate_dates[nearest_idx[0]] if nearest_idx.size else candidate_dates[0]
 
 # ---- FIRE OVERLAY TOGGLE ----
 st.sidebar.markdown("---")
@@ -344,13 +356,25 @@ show_fires = st.sidebar.checkbox(
     help="Muestra ubicación de incendios históricos con datos meteorológicos del día"
 )
 
-# ---- DATA SLICE (with caching) ----
-@st.cache_data(show_spinner=False)
+# ---- DATA SLICE (precomputed once, O(1) lookups afterwards) ----
+@st.cache_resource(show_spinner="Precalculando índices de riesgo...")
+def precompute_all_risk(_ds, date_key):
+    """Compute the risk index for every available date once and cache the results"""
+    risk_by_date = {}
+    # isel is pure stride arithmetic; sel would redo a time-index lookup
+    # per date
+    for i, date in enumerate(pd.to_datetime(_ds[date_key].values)):
+        data_slice = _ds.isel({date_key: i})
+        risk_by_date[date] = (data_slice, rc.calculate_risk_index(data_slice))
+    return risk_by_date
+
 def get_processed_data(_ds, date, date_key):
-    """Cache processed data for each date"""
+    """Look up precomputed data for a date (falls back to nearest-date selection)"""
+    risk_by_date = precompute_all_risk(_ds, date_key)
+    if date in risk_by_date:
+        return risk_by_date[date]
     data_slice = _ds.sel({date_key: date}, method='nearest')
-    risk_data = rc.calculate_risk_index(data_slice)
-    return data_slice, risk_data
+    return data_slice, rc.calculate_risk_index(data_slice)
 
 try:
     data_slice, risk_data = get_processed_data(ds, chosen_date, date_key)
@@ -361,14 +385,68 @@ except Exception as e:
         st.code(traceback.format_exc())
     st.stop()
 
+# ---- LAND MASK (derived once per dataset) ----
+@st.cache_resource(show_spinner=False)
+def get_land_mask(_ds, date_key):
+    """Boolean land mask (True = land) derived once from the land-sea fraction"""
+    if 'lsm' not in _ds:
+        return None
+    lsm = _ds['lsm']
+    if date_key in lsm.dims:
+        lsm = lsm.isel({date_key: 0})
+    return lsm.values > 0.5
+
+land_mask = get_land_mask(ds, date_key)
+
+# ---- ALERTS (summary stats fused into one startup pass, O(1) per rerun) ----
+@st.cache_resource(show_spinner=False)
+def precompute_alerts_table(_ds, _threshold_info, date_key):
+    """Compute alert statistics for every date once; reruns read scalars"""
+    risk_by_date = precompute_all_risk(_ds, date_key)
+    return {
+        date: rc.calculate_alerts(risk_data, _threshold_info)
+        for date, (_, risk_data) in risk_by_date.items()
+    }
+
+try:
+    alerts_table = precompute_alerts_table(ds, global_threshold_info, date_key)
+    alerts = alerts_table.get(chosen_date)
+    if alerts is None:
+        alerts = rc.calculate_alerts(risk_data, global_threshold_info)
+    high_risk_regions = rc.identify_high_risk_regions(risk_data, alerts, land_mask)
+except Exception as e:
+    st.error(f"Error calculando alertas: {e}")
+    import traceback
+    st.code(traceback.format_exc())
+    st.stop()
+
 # ---- MAIN LAYOUT - ADJUSTED FOR 16:9 ----
 col1, col2 = st.columns([1, 3])
 
-with col1:
+@st.fragment(run_every=f"{st.session_state.animation_speed}s" if st.session_state.playing else None)
+def render_alerts_fragment(alerts, high_risk_regions):
+    """Alerts column; isolated so unrelated widget clicks don't recompute it
+
+    Shares the map fragment's run_every while playing: the month advance
+    happens over there in session state, so this fragment re-reads
+    sel_month each tick and swaps in that frame's alerts — otherwise the
+    column would stay frozen on the month the animation started from.
+    """
+    if st.session_state.playing:
+        frame_idx = np.flatnonzero(
+            (year_arr == selected_year) &
+            (month_arr == st.session_state["sel_month"])
+        )
+        if frame_idx.size:
+            frame_date = candidate_dates[frame_idx[0]]
+            frame_alerts = precompute_alerts_table(
+                ds, global_threshold_info, date_key).get(frame_date)
+            if frame_alerts is not None:
+                _, frame_risk = get_processed_data(ds, frame_date, date_key)
+                alerts = frame_alerts
+                high_risk_regions = rc.identify_high_risk_regions(
+                    frame_risk, frame_alerts, land_mask)
     try:
-        # Calculate alerts with GLOBAL threshold
-        alerts = rc.calculate_alerts(risk_data, global_threshold_info)
-        
         # Centered statistics without title
         st.markdown("""
         <style>
@@ -391,10 +469,7 @@ with col1:
         
         st.markdown("---")
         st.markdown("### ⚠️ Alertas por Región")
-        
-        # Get high-risk regions (with land-sea mask filtering)
-        high_risk_regions = rc.identify_high_risk_regions(risk_data, alerts, data_slice)
-        
+
         if len(high_risk_regions) > 0:
             st.error(f"🔴 **{len(high_risk_regions)} zonas** con riesgo alto detectadas")
             
@@ -434,8 +509,249 @@ with col1:
         import traceback
         st.code(traceback.format_exc())
 
-with col2:
-    st.markdown(f"### Mapa Interactivo de Galicia | {selected_var} - {sel_month}/{selected_year}")
+def fast_p2_p98(values):
+    """2nd/98th percentiles via O(N) introselect instead of a sort"""
+    a = values[np.isfinite(values)].ravel()
+    n = a.size
+    if n == 0:
+        return np.nan, np.nan
+    lo_k = max(int(0.02 * n), 0)
+    hi_k = min(int(0.98 * n), n - 1)
+    part = np.partition(a, [lo_k, hi_k])
+    return float(part[lo_k]), float(part[hi_k])
+
+def get_colorbar_data(risk_data, data_slice, variable):
+    """Return (DataArray, colormap name, unit) used by the colorbar for a variable"""
+    if variable == 'risk_index':
+        return risk_data['risk'], 'YlOrRd', ''
+    elif variable == 'temperature':
+        return risk_data['temperature'], 'RdYlBu_r', '°C'
+    elif variable == 'relative_humidity':
+        return risk_data['relative_humidity'], 'Blues', '%'
+    elif variable == 'solar_radiation':
+        if 'ssrd' in data_slice.data_vars:
+            return data_slice['ssrd'] / 1e6, 'YlOrRd', 'J/m²'
+        return risk_data['temperature'], 'YlOrRd', 'J/m²'
+    elif variable == 'wind_speed':
+        return risk_data['wind_speed'], 'viridis', 'm/s'
+    return risk_data['risk'], 'YlOrRd', ''
+
+@st.cache_data(show_spinner=False)
+def precompute_colorbar_ranges(_ds, date_key):
+    """Precompute colorbar ranges (p2/p98/min/max) for every variable and date
+
+    Stored as one array per statistic indexed by date position, so each
+    rerun costs a table lookup instead of an O(N log N) percentile.
+    """
+    risk_by_date = precompute_all_risk(_ds, date_key)
+    dates = pd.to_datetime(_ds[date_key].values)
+    n = len(dates)
+    ranges = {
+        var: {stat: np.full(n, np.nan) for stat in ('p2', 'p98', 'min', 'max')}
+        for var, _, _ in VAR_SPECS
+    }
+    for i, date in enumerate(dates):
+        data_slice, risk_data = risk_by_date[date]
+        for var, _, _ in VAR_SPECS:
+            data_for_colorbar, _, _ = get_colorbar_data(risk_data, data_slice, var)
+            values = data_for_colorbar.values
+            if np.all(np.isnan(values)):
+                continue
+            p2, p98 = fast_p2_p98(values)
+            ranges[var]['p2'][i] = p2
+            ranges[var]['p98'][i] = p98
+            ranges[var]['min'][i] = np.nanmin(values)
+            ranges[var]['max'][i] = np.nanmax(values)
+    date_index = {date: i for i, date in enumerate(dates)}
+    return ranges, date_index
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def html_colorbar(cmap_name, vmin, vmax, unit):
+    """Pure-CSS vertical colorbar; the browser renders the gradient"""
+    from matplotlib import cm as mpl_cm
+    from matplotlib import colors as mpl_colors
+
+    cmap = mpl_cm.get_cmap(cmap_name)
+    stops = [mpl_colors.rgb2hex(cmap(t)) for t in np.linspace(0, 1, 8)]
+    gradient = ", ".join(stops)
+
+    # Tick labels top (vmax) to bottom (vmin)
+    ticks = np.linspace(vmax, vmin, 6)
+    if unit:
+        labels = "".join(f'<span style="font-size:10px; color:#ecf0f1;">{v:.1f}{unit}</span>' for v in ticks)
+    else:
+        labels = "".join(f'<span style="font-size:10px; color:#ecf0f1;">{v:.2f}</span>' for v in ticks)
+
+    return f"""
+    <div style="display:flex; align-items:stretch; height:280px; gap:6px; padding-top:8px;">
+        <div style="width:18px; border:1.5px solid #ecf0f1; border-radius:2px;
+                    background:linear-gradient(to top, {gradient});"></div>
+        <div style="display:flex; flex-direction:column; justify-content:space-between;">
+            {labels}
+        </div>
+    </div>
+    """
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def build_map(date_iso, variable, show_fires, _risk_data, _data_slice, _fires_data, _ds, date_key):
+    """Build the folium map once per (date, variable, fires) combination
+
+    Large xarray/pandas arguments are underscore-prefixed so Streamlit skips
+    hashing them; the scalar arguments act as the cache key.
+    """
+    return mg.create_interactive_map(
+        _risk_data,
+        _data_slice,
+        variable=variable,
+        date=pd.Timestamp(date_iso),
+        show_fires=show_fires,
+        fires_data=_fires_data,
+        dataset=_ds,
+        date_key=date_key
+    )
+
+# Disk snapshots of rendered map HTML, following the folium maintainer's
+# advice to cache the generated HTML itself
+MAP_CACHE_DIR = "maps"
+MAP_CACHE_MAX = 64
+
+# In-memory LRU in front of the disk snapshots: repeat renders of the
+# same frame become a dictionary hit instead of a file read. It lives
+# behind cache_resource because module globals are rebuilt on every
+# full script rerun, which would empty a plain module-level dict
+@st.cache_resource(show_spinner=False)
+def _map_html_lru():
+    return OrderedDict()
+
+def get_map_html(date, variable, show_fires, risk_data, data_slice, high_risk_regions):
+    """Serve the rendered map HTML from cache, building and persisting on miss"""
+    lru = _map_html_lru()
+    key = (date.isoformat(), variable, show_fires)
+    html = lru.get(key)
+    if html is not None:
+        lru.move_to_end(key)
+        return html
+
+    os.makedirs(MAP_CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(MAP_CACHE_DIR, f"{date.isoformat()}_{variable}_{show_fires}.html")
+
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            html = f.read()
+        lru[key] = html
+        if len(lru) > MAP_CACHE_MAX:
+            lru.popitem(last=False)
+        return html
+
+    m = build_map(date.isoformat(), variable, show_fires,
+                  risk_data, data_slice, fires_data, ds, date_key)
+
+    # Add high-risk region markers on a copy so the cached map object is
+    # never mutated across sessions
+    if hasattr(mg, 'add_risk_markers'):
+        m = mg.add_risk_markers(copy.deepcopy(m), high_risk_regions)
+
+    html = m.get_root().render()
+    lru[key] = html
+    if len(lru) > MAP_CACHE_MAX:
+        lru.popitem(last=False)
+    with open(cache_path, 'w') as f:
+        f.write(html)
+
+    # Cap the snapshot directory, dropping the oldest files first
+    snapshots = [os.path.join(MAP_CACHE_DIR, f)
+                 for f in os.listdir(MAP_CACHE_DIR) if f.endswith('.html')]
+    if len(snapshots) > MAP_CACHE_MAX:
+        snapshots.sort(key=os.path.getmtime)
+        for old in snapshots[:len(snapshots) - MAP_CACHE_MAX]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    return html
+
+# Single worker that warms the next animation frame while the current one
+# is on screen; the numpy/xarray work releases the GIL so it overlaps the
+# run_every wait. Held behind cache_resource so full reruns reuse one
+# executor instead of leaking a fresh pool per rerun
+@st.cache_resource(show_spinner=False)
+def _prefetch_pool():
+    return ThreadPoolExecutor(max_workers=1)
+
+def _submit_prefetch(fn, *args):
+    """Run fn on the shared worker with the caller's ScriptRunContext
+
+    The warm task calls st.cache_* functions, which warn (and skip the
+    session) when invoked from a thread without a script context, so the
+    submitting script's context is attached inside the worker first.
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+
+    def run():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    return _prefetch_pool().submit(run)
+
+def peek_next_month(available, month_idx, selected_year, current_month):
+    """Next month the animation will show, without touching session state"""
+    months_for_year = available.get(selected_year)
+    if not months_for_year:
+        return None
+    current_idx = month_idx[selected_year].get(current_month)
+    if current_idx is None:
+        return None
+    n = len(months_for_year)
+    if st.session_state.loop_animation:
+        return months_for_year[(current_idx + 1) % n]
+    if current_idx < n - 1:
+        return months_for_year[current_idx + 1]
+    return None
+
+def _warm_frame(date, variable):
+    """Background task: make sure the frame's map snapshot is on disk"""
+    try:
+        frame_slice, frame_risk = get_processed_data(ds, date, date_key)
+        frame_alerts = precompute_alerts_table(ds, global_threshold_info, date_key).get(date)
+        if frame_alerts is None:
+            frame_alerts = rc.calculate_alerts(frame_risk, global_threshold_info)
+        regions = rc.identify_high_risk_regions(frame_risk, frame_alerts, land_mask)
+        get_map_html(date, variable, show_fires, frame_risk, frame_slice, regions)
+    except Exception:
+        # Prefetch is best-effort; the visible path rebuilds on miss anyway
+        pass
+
+@st.fragment(run_every=f"{st.session_state.animation_speed}s" if st.session_state.playing else None)
+def render_map_fragment(risk_data, data_slice, alerts, high_risk_regions, chosen_date):
+    """Map + colorbar column; isolated from sidebar animation widgets
+
+    While playing, run_every re-executes only this fragment per frame and
+    the month advance happens here, so animation ticks skip the full
+    script rerun entirely.
+    """
+    if st.session_state.playing:
+        next_month_animation(available, month_idx, selected_year)
+        if not st.session_state.playing:
+            # Non-looping animation just finished: the run_every timers
+            # stay armed until a full rerun re-evaluates the decorators,
+            # so trigger that rerun instead of ticking forever
+            st.rerun()
+        frame_idx = np.flatnonzero(
+            (year_arr == selected_year) &
+            (month_arr == st.session_state["sel_month"])
+        )
+        frame_date = candidate_dates[frame_idx[0]] if frame_idx.size else candidate_dates[0]
+        if frame_date != chosen_date:
+            chosen_date = frame_date
+            data_slice, risk_data = get_processed_data(ds, chosen_date, date_key)
+            alerts = precompute_alerts_table(ds, global_threshold_info, date_key).get(chosen_date)
+            if alerts is None:
+                alerts = rc.calculate_alerts(risk_data, global_threshold_info)
+            high_risk_regions = rc.identify_high_risk_regions(risk_data, alerts, land_mask)
+
+    st.markdown(f"### Mapa Interactivo de Galicia | {selected_var} - {st.session_state['sel_month']}/{selected_year}")
     try:
         map_height = 450 if is_mobile else 550
         
@@ -443,285 +759,233 @@ with col2:
         map_col, colorbar_col = st.columns([5, 1])
         
         with map_col:
-            m = mg.create_interactive_map(
+            map_html = get_map_html(
+                chosen_date,
+                LABEL_TO_KEY[selected_var],
+                show_fires,
                 risk_data,
                 data_slice,
-                variable=variable_options[selected_var],
-                date=chosen_date,
-                show_fires=show_fires,
-                fires_data=fires_data,
-                dataset=ds,
-                date_key=date_key
+                high_risk_regions
             )
-            
-            # Add high-risk region markers (with land-sea mask filtering)
-            high_risk_regions = rc.identify_high_risk_regions(risk_data, alerts, data_slice)
-            if hasattr(mg, 'add_risk_markers'):
-                m = mg.add_risk_markers(m, high_risk_regions)
-            
-            st_folium(m, width=None, height=map_height)
+            components.html(map_html, height=map_height)
         
         with colorbar_col:
-            # Get colorbar data based on variable
-            if variable_options[selected_var] == 'risk_index':
-                data_for_colorbar = risk_data['risk']
-                cmap_name = 'YlOrRd'
-                unit = ''
-            elif variable_options[selected_var] == 'temperature':
-                data_for_colorbar = risk_data['temperature']
-                cmap_name = 'RdYlBu_r'
-                unit = '°C'
-            elif variable_options[selected_var] == 'relative_humidity':
-                data_for_colorbar = risk_data['relative_humidity']
-                cmap_name = 'Blues'
-                unit = '%'
-            elif variable_options[selected_var] == 'solar_radiation':
-                if 'ssrd' in data_slice.data_vars:
-                    data_for_colorbar = data_slice['ssrd'] / 1e6
-                else:
-                    data_for_colorbar = risk_data['temperature']
-                cmap_name = 'YlOrRd'
-                unit = 'J/m²'
-            elif variable_options[selected_var] == 'wind_speed':
-                data_for_colorbar = risk_data['wind_speed']
-                cmap_name = 'viridis'
-                unit = 'm/s'
-            else:
-                data_for_colorbar = risk_data['risk']
-                cmap_name = 'YlOrRd'
-                unit = ''
-            
-            # Calculate value range
-            values = data_for_colorbar.values
-            valid_data = values[~np.isnan(values)]
-            
-            if len(valid_data) > 0:
-                if variable_options[selected_var] == 'solar_radiation':
-                    vmin = float(np.nanmin(valid_data))
-                    vmax = float(np.nanmax(valid_data))
+            variable = LABEL_TO_KEY[selected_var]
+            _, cmap_name, unit = get_colorbar_data(risk_data, data_slice, variable)
+
+            # Look up the precomputed value range for this (variable, date)
+            ranges, date_index = precompute_colorbar_ranges(ds, date_key)
+            var_ranges = ranges[variable]
+            idx = date_index.get(chosen_date)
+
+            if idx is not None and not np.isnan(var_ranges['min'][idx]):
+                if variable == 'solar_radiation':
+                    vmin = float(var_ranges['min'][idx])
+                    vmax = float(var_ranges['max'][idx])
                 else:
-                    vmin = float(np.percentile(valid_data, 2))
-                    vmax = float(np.percentile(valid_data, 98))
-                
+                    vmin = float(var_ranges['p2'][idx])
+                    vmax = float(var_ranges['p98'][idx])
+
                 # Ensure vmin < vmax
                 if vmin >= vmax:
-                    vmin = float(np.nanmin(valid_data))
-                    vmax = float(np.nanmax(valid_data))
+                    vmin = float(var_ranges['min'][idx])
+                    vmax = float(var_ranges['max'][idx])
                     if vmin >= vmax:
                         vmax = vmin + 0.01
                 
-                # Create colorbar
-                from matplotlib import cm as mpl_cm
-                from matplotlib import colors as mpl_colors
-                import matplotlib.pyplot as plt
-                import matplotlib.ticker as ticker
-                
-                cmap = mpl_cm.get_cmap(cmap_name)
-                norm = mpl_colors.Normalize(vmin=vmin, vmax=vmax)
-                
-                # Fixed dimensions
-                fig_width = 0.4
-                fig_height = 2.8
-                
-                # Create figure
-                fig = plt.figure(figsize=(fig_width, fig_height), dpi=100)
-                fig.patch.set_facecolor('#262730')
-                
-                # Create axes
-                ax = fig.add_axes([0.3, 0.05, 0.3, 0.9])
-                
-                # Create colorbar
-                cb = plt.colorbar(
-                    mpl_cm.ScalarMappable(norm=norm, cmap=cmap),
-                    cax=ax,
-                    orientation='vertical'
+                # Display cached CSS colorbar (rounded key for cache hits)
+                st.markdown(html_colorbar(cmap_name, round(vmin, 3), round(vmax, 3), unit),
+                            unsafe_allow_html=True)
+
+        # While playing, warm the next frame's snapshot in the background so
+        # the following tick serves straight from disk
+        if st.session_state.playing:
+            next_month = peek_next_month(available, month_idx, selected_year,
+                                         st.session_state["sel_month"])
+            if next_month is not None:
+                next_idx = np.flatnonzero(
+                    (year_arr == selected_year) & (month_arr == next_month)
                 )
-                
-                cb.set_label(unit, fontsize=8, color='#ecf0f1')
-                
-                # Create custom tick formatter to add units
-                def format_func(value, pos):
-                    if unit:
-                        return f'{value:.1f}{unit}'
-                    else:
-                        return f'{value:.2f}'
-                
-                cb.ax.yaxis.set_major_formatter(ticker.FuncFormatter(format_func))
-                
-                # Style ticks
-                cb.ax.yaxis.set_ticks_position('right')
-                cb.ax.yaxis.set_label_position('right')
-                cb.ax.tick_params(labelsize=7, colors='#ecf0f1', length=3, width=1)
-                cb.outline.set_edgecolor('#ecf0f1')
-                cb.outline.set_linewidth(1.5)
-                
-                # Set number of ticks
-                cb.locator = ticker.MaxNLocator(nbins=8)
-                cb.update_ticks()
-                
-                # Display
-                st.pyplot(fig, use_container_width=False)
-                plt.close()
+                future = st.session_state.get("next_frame_future")
+                if next_idx.size and (future is None or future.done()):
+                    st.session_state.next_frame_future = _submit_prefetch(
+                        _warm_frame, candidate_dates[next_idx[0]], LABEL_TO_KEY[selected_var]
+                    )
 
-            
     except Exception as e:
         st.error(f"Error generando mapa: {e}")
         with st.expander("Ver detalles"):
             import traceback
             st.code(traceback.format_exc())
 
+with col1:
+    render_alerts_fragment(alerts, high_risk_regions)
 
-# ---- TEMPORAL EVOLUTION ----
-st.markdown("---")
-st.markdown(f"### Evolución Mensual {selected_year} - {selected_var}")
+with col2:
+    render_map_fragment(risk_data, data_slice, alerts, high_risk_regions, chosen_date)
 
-@st.cache_data(show_spinner="Generando gráfico...")
+# ---- TEMPORAL EVOLUTION ----
+@st.cache_data(show_spinner="Generando gráfico...", persist="disk")
 def get_yearly_trend(_ds, variable, year, date_key):
     """Cache yearly trend calculation"""
     return dp.calculate_yearly_trend(_ds, variable, year, date_key=date_key)
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, persist="disk")
 def get_historical_average(_ds, variable, date_key):
     """Cache historical average calculation"""
     return dp.calculate_historical_average(_ds, variable, 2017, 2024, date_key=date_key)
 
-try:
-    trend_var = variable_options[selected_var]
-    temporal_data = get_yearly_trend(ds, trend_var, selected_year, date_key)
-    historical_avg = get_historical_average(ds, trend_var, date_key)
+@st.fragment(run_every=f"{st.session_state.animation_speed}s" if st.session_state.playing else None)
+def render_trend_fragment():
+    """Temporal evolution plot; isolated from map/alert widgets
+
+    Ticks with the animation so the current-month star follows playback
+    instead of staying pinned to the starting month.
+    """
+    # Imported lazily so cold starts don't pay for plotly until needed
+    import plotly.graph_objects as go
+    cur_month = st.session_state.get("sel_month", sel_month)
+
+    st.markdown("---")
+    st.markdown(f"### Evolución Mensual {selected_year} - {selected_var}")
+    try:
+        trend_var = LABEL_TO_KEY[selected_var]
+        temporal_data = get_yearly_trend(ds, trend_var, selected_year, date_key)
+        historical_avg = get_historical_average(ds, trend_var, date_key)
     
-    if len(temporal_data['values']) > 0:
-        # Month names in Spanish for x-axis
-        month_names = [
-            "Ene", "Feb", "Mar", "Abr", "May", "Jun",
-            "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"
-        ]
-        
-        # Create x-axis labels for current year
-        x_labels = [month_names[m-1] for m in temporal_data['months']]
+        if len(temporal_data['values']) > 0:
+            # Month names in Spanish for x-axis
+            month_names = [
+                "Ene", "Feb", "Mar", "Abr", "May", "Jun",
+                "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"
+            ]
         
-        # Prepare historical average data (all 12 months)
-        hist_months = list(range(1, 13))
-        hist_values = [historical_avg.get(m, np.nan) for m in hist_months]
-        hist_labels = month_names
+            # Create x-axis labels for current year
+            x_labels = np.asarray(month_names)[np.asarray(temporal_data['months'], dtype=int) - 1]
         
-        # Get unit label for y-axis
-        unit_labels = {
-            'risk_index': 'Índice (0-1)',
-            'temperature': 'Temperatura (°C)',
-            'relative_humidity': 'Humedad (%)',
-            'solar_radiation': 'Radiación (J/m²)',
-            'wind_speed': 'Velocidad (m/s)'
-        }
-        y_label = unit_labels.get(trend_var, selected_var)
+            # Historical average is already a length-12 array (Jan..Dec)
+            hist_values = historical_avg
+            hist_labels = month_names
         
-        fig = go.Figure()
+            # Get unit label for y-axis
+            unit_labels = {
+                'risk_index': 'Índice (0-1)',
+                'temperature': 'Temperatura (°C)',
+                'relative_humidity': 'Humedad (%)',
+                'solar_radiation': 'Radiación (J/m²)',
+                'wind_speed': 'Velocidad (m/s)'
+            }
+            y_label = unit_labels.get(trend_var, selected_var)
         
-        # Add historical average line (gray, dashed)
-        fig.add_trace(go.Scatter(
-            x=hist_labels,
-            y=hist_values,
-            mode='lines',
-            name='Promedio 2017-2024',
-            line=dict(
-                color='rgba(150, 150, 150, 0.6)',
-                width=3,
-                dash='dash',
-                shape='spline',
-                smoothing=1.3
-            ),
-            hovertemplate='<b>Promedio histórico</b><br>%{y:.2f}<extra></extra>'
-        ))
+            fig = go.Figure()
         
-        # Add current year line (red, prominent)
-        fig.add_trace(go.Scatter(
-            x=x_labels,
-            y=temporal_data['values'],
-            mode='lines+markers',
-            name=f'{selected_year}',
-            line=dict(
-                color='#e74c3c',
-                width=4,
-                shape='spline',
-                smoothing=1.3
-            ),
-            marker=dict(
-                size=10 if not is_mobile else 8,
-                color='#e74c3c',
-                symbol='circle',
-                line=dict(color='white', width=2)
-            ),
-            fill='tozeroy',
-            fillcolor='rgba(231, 76, 60, 0.1)',
-            hovertemplate='<b>%{x}</b><br>%{y:.2f}<extra></extra>'
-        ))
+            # Add historical average line (gray, dashed)
+            fig.add_trace(go.Scatter(
+                x=hist_labels,
+                y=hist_values,
+                mode='lines',
+                name='Promedio 2017-2024',
+                line=dict(
+                    color='rgba(150, 150, 150, 0.6)',
+                    width=3,
+                    dash='dash',
+                    shape='spline',
+                    smoothing=1.3
+                ),
+                hovertemplate='<b>Promedio histórico</b><br>%{y:.2f}<extra></extra>'
+            ))
         
-        # Highlight current month with a star marker
-        try:
-            current_month_idx = temporal_data['months'].index(sel_month)
-            current_month_value = temporal_data['values'][current_month_idx]
-            current_month_label = month_names[sel_month - 1]
-            
+            # Add current year line (red, prominent)
             fig.add_trace(go.Scatter(
-                x=[current_month_label],
-                y=[current_month_value],
-                mode='markers',
-                name='Mes actual',
+                x=x_labels,
+                y=temporal_data['values'],
+                mode='lines+markers',
+                name=f'{selected_year}',
+                line=dict(
+                    color='#e74c3c',
+                    width=4,
+                    shape='spline',
+                    smoothing=1.3
+                ),
                 marker=dict(
-                    size=20,
-                    color='gold',
-                    symbol='star',
+                    size=10 if not is_mobile else 8,
+                    color='#e74c3c',
+                    symbol='circle',
                     line=dict(color='white', width=2)
                 ),
-                hovertemplate=f'<b>Mes actual: {current_month_label}</b><br>%{{y:.2f}}<extra></extra>'
+                fill='tozeroy',
+                fillcolor='rgba(231, 76, 60, 0.1)',
+                hovertemplate='<b>%{x}</b><br>%{y:.2f}<extra></extra>'
             ))
-        except (ValueError, IndexError):
-            pass
         
-        fig.update_layout(
-            title=dict(
-                text=f"Variación Mensual - {selected_var} ({selected_year})",
-                font=dict(size=18, color='#fafafa')
-            ),
-            xaxis_title="Mes",
-            yaxis_title=y_label,
-            template="plotly_dark",
-            paper_bgcolor='#262730',
-            plot_bgcolor='#1a1a1a',
-            height=300,
-            hovermode='x unified',
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1,
-                bgcolor='rgba(0,0,0,0.3)',
-                font=dict(color='#fafafa')
-            ),
-            font=dict(color='#fafafa'),
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(255,255,255,0.1)',
-                zeroline=False
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(255,255,255,0.1)',
-                zeroline=False
+            # Highlight current month with a star marker
+            try:
+                current_month_idx = temporal_data['months'].index(cur_month)
+                current_month_value = temporal_data['values'][current_month_idx]
+                current_month_label = month_names[cur_month - 1]
+            
+                fig.add_trace(go.Scatter(
+                    x=[current_month_label],
+                    y=[current_month_value],
+                    mode='markers',
+                    name='Mes actual',
+                    marker=dict(
+                        size=20,
+                        color='gold',
+                        symbol='star',
+                        line=dict(color='white', width=2)
+                    ),
+                    hovertemplate=f'<b>Mes actual: {current_month_label}</b><br>%{{y:.2f}}<extra></extra>'
+                ))
+            except (ValueError, IndexError):
+                pass
+        
+            fig.update_layout(
+                title=dict(
+                    text=f"Variación Mensual - {selected_var} ({selected_year})",
+                    font=dict(size=18, color='#fafafa')
+                ),
+                xaxis_title="Mes",
+                yaxis_title=y_label,
+                template="plotly_dark",
+                paper_bgcolor='#262730',
+                plot_bgcolor='#1a1a1a',
+                height=300,
+                hovermode='x unified',
+                showlegend=True,
+                legend=dict(
+                    orientation="h",
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="right",
+                    x=1,
+                    bgcolor='rgba(0,0,0,0.3)',
+                    font=dict(color='#fafafa')
+                ),
+                font=dict(color='#fafafa'),
+                xaxis=dict(
+                    showgrid=True,
+                    gridcolor='rgba(255,255,255,0.1)',
+                    zeroline=False
+                ),
+                yaxis=dict(
+                    showgrid=True,
+                    gridcolor='rgba(255,255,255,0.1)',
+                    zeroline=False
+                )
             )
-        )
         
-        st.plotly_chart(fig, use_container_width=True)
-    else:
-        st.info(f"No hay datos disponibles para {selected_year}")
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info(f"No hay datos disponibles para {selected_year}")
     
-except Exception as e:
-    st.error(f"Error generando gráfico temporal: {e}")
-    with st.expander("Ver detalles"):
-        import traceback
-        st.code(traceback.format_exc())
+    except Exception as e:
+        st.error(f"Error generando gráfico temporal: {e}")
+        with st.expander("Ver detalles"):
+            import traceback
+            st.code(traceback.format_exc())
+
+render_trend_fragment()
 
 # ---- DATA UPDATE SECTION ----
 st.markdown("---")
@@ -774,35 +1038,36 @@ if st.session_state.get('updating', False):
         progress_bar.progress(20)
         status_message.info("Iniciando descarga de datos ERA5...")
         
+        # stderr is merged into stdout: cdsapi logs there, and draining
+        # only one pipe while the other fills up would deadlock the
+        # child once its stderr buffer is full
         process = subprocess.Popen(
             ['python', update_script],
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
             bufsize=1
         )
-        
-        steps = [
-            (30, "Descargando 30/100.."),
-            (40, "Descargando 40/100.."),
-            (50, "Descargando 50/100.."),
-            (60, "Descargando 60/100.."),
-            (70, "Descargando 70/100.."),
-            (80, "Descargando 80/100.."),
-            (90, "Guardando en formato NetCDF..."),
-        ]
-        
-        for progress, message in steps:
-            if process.poll() is None:
+
+        # Stream the downloader's real output instead of sleeping on a
+        # fixed schedule; each printed line advances the progress bar
+        # and the last lines are kept for the error display
+        progress = 20
+        tail = deque(maxlen=40)
+        with st.status("Descargando datos ERA5...", expanded=True) as status:
+            for line in iter(process.stdout.readline, ''):
+                line = line.strip()
+                if not line:
+                    continue
+                tail.append(line)
+                status.update(label=line)
+                progress = min(progress + 5, 95)
                 progress_bar.progress(progress)
-                status_message.info(message)
-                time.sleep(5)
-            else:
-                break
-        
-        stdout, stderr = process.communicate()
-        
-        if process.returncode == 0:
+
+        stderr = '\n'.join(tail)
+        returncode = process.wait()
+
+        if returncode == 0:
             progress_bar.progress(100)
             progress_text.text("✅ Actualización completada")
             status_message.success("¡Datos actualizados correctamente! Recargando la aplicación...")
@@ -857,8 +1122,3 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# ---- ANIMATION LOOP (must be at the very end) ----
-if st.session_state.playing:
-    time.sleep(st.session_state.animation_speed)
-    next_month_animation(available, selected_year)
-    st.rerun()
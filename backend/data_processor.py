@@ -2,11 +2,26 @@ import xarray as xr
 import numpy as np
 import pandas as pd
 from glob import glob
+import math
+import os
 import warnings
+import weakref
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 # Suppress chunking warnings
 warnings.filterwarnings('ignore', message='.*chunks.*')
 
+# The downloader requests ~27 ERA5 variables but the app only consumes
+# these; everything else is dropped at open time so it never enters the
+# dask graph or the decode path. 'ws' and 'rh' are derived fields the
+# zarr build bakes in so consumers skip recomputing them
+NEEDED_VARS = {'t2m', 'd2m', 'u10', 'v10', 'ssrd', 'swvl1', 'lsm', 'ws', 'rh'}
+
 def preprocess_rename_time(ds):
     """Rename valid_time to time if present"""
     if 'valid_time' in ds.coords or 'valid_time' in ds.dims:
@@ -14,254 +29,417 @@ def preprocess_rename_time(ds):
     return ds
 
 def load_data():
-    """Load and merge all NetCDF files safely"""
+    """Load the consolidated zarr store, or merge the NetCDF files lazily"""
+    if os.path.isdir('data/galicia.zarr'):
+        print("Loading consolidated zarr store...")
+        merged = xr.open_zarr('data/galicia.zarr', consolidated=True)
+        merged = merged[[v for v in NEEDED_VARS if v in merged]]
+        print(f"Data loaded successfully! Shape: {dict(merged.dims)}")
+        return merged
+
     files = sorted(glob('data/*.nc'))
     if not files:
         raise FileNotFoundError("No se encontraron archivos NetCDF en data/")
-    
+
     print(f"Loading {len(files)} NetCDF files...")
-    
-    # Load and immediately convert to in-memory data
+
+    try:
+        # Dask opens the files in parallel and keeps the cube lazy until a
+        # reduction actually needs the values
+        merged = xr.open_mfdataset(
+            files,
+            engine='netcdf4',
+            combine='by_coords',
+            compat='no_conflicts',
+            parallel=True,
+            preprocess=preprocess_rename_time,
+            chunks={'time': 12}
+        )
+        merged = merged[[v for v in NEEDED_VARS if v in merged]]
+    except Exception as e:
+        print(f"Warning: parallel open failed ({e}), loading sequentially")
+        merged = _load_data_sequential(files)
+
+    print(f"Data loaded successfully! Shape: {dict(merged.dims)}")
+    return merged
+
+def _load_data_sequential(files):
+    """Fallback: open each file eagerly and merge in memory"""
     datasets = []
     for f in files:
         print(f"  - Loading {f}")
         try:
             with xr.open_dataset(f, engine='netcdf4') as ds:
                 ds = preprocess_rename_time(ds)
+                ds = ds[[v for v in NEEDED_VARS if v in ds]]
                 ds = ds.load()
                 datasets.append(ds)
         except Exception as e:
             print(f"    Warning: Could not load {f}: {e}")
             continue
-    
+
     if not datasets:
         raise RuntimeError("No datasets could be loaded successfully")
-    
+
     print("Merging datasets...")
-    merged = xr.merge(datasets, compat='no_conflicts')
-    print(f"Data loaded successfully! Shape: {dict(merged.dims)}")
-    return merged
+    # The CDS downloader guarantees one fixed grid, so skip merge's
+    # element-wise conflict scan and just concatenate by coordinates.
+    # The guard compares the actual coordinate values (same sizes can
+    # still mean shifted grids) and raises rather than asserting, since
+    # compat='override' below would silently paper over a mismatch and
+    # asserts vanish under python -O
+    ref = datasets[0]
+    for d in datasets[1:]:
+        for dim in ('latitude', 'longitude'):
+            if not np.array_equal(d[dim].values, ref[dim].values):
+                raise RuntimeError(
+                    "Los archivos NetCDF no comparten la misma malla")
+    # coords='minimal' is required alongside compat='override': the
+    # default coords='different' re-enables the comparison scan and
+    # xarray rejects that combination outright
+    return xr.combine_by_coords(datasets, join='override', compat='override',
+                                coords='minimal', combine_attrs='override')
+
+def ident_cache_get(cache, obj):
+    """Look up an id()-keyed cache entry, guarding against id reuse
+
+    Entries carry a weakref to the keyed object: if the original object
+    was garbage collected and its id recycled by a new one, the stored
+    referent no longer matches and the stale entry is dropped instead of
+    being served for the wrong object.
+    """
+    entry = cache.get(id(obj))
+    if entry is None:
+        return None
+    ref, value = entry
+    if ref() is not obj:
+        del cache[id(obj)]
+        return None
+    return value
+
+def ident_cache_put(cache, obj, value):
+    """Store a value keyed by id(obj) together with a weakref guard"""
+    cache[id(obj)] = (weakref.ref(obj), value)
+
+# Decoded time axis cached per dataset identity, same scheme as the
+# time-series cache below: every rerun asks for the same conversion
+_TIME_INDEX_CACHE = {}
+
+def decoded_times(ds, date_key='time'):
+    """Decode the time axis once: (DatetimeIndex, year array, month array)"""
+    cached = ident_cache_get(_TIME_INDEX_CACHE, ds)
+    if cached is None:
+        values = ds[date_key].values
+        # Year/month by integer arithmetic on the datetime64 codes: no
+        # object columns, no .dt accessors, two compact int arrays
+        t = values.astype('datetime64[M]')
+        months = (t.astype(np.int64) % 12 + 1).astype(np.int8)
+        years = (t.astype('datetime64[Y]').astype(np.int64) + 1970).astype(np.int16)
+        cached = (pd.to_datetime(values), years, months)
+        ident_cache_put(_TIME_INDEX_CACHE, ds, cached)
+    return cached
 
 def get_available_year_months(ds):
     """Extract available (year, month) combinations from dataset"""
-    dates = pd.to_datetime(ds.time.values)
-    df = pd.DataFrame({'date': dates})
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    years = sorted(df['year'].unique())
-    available = {y: sorted(df[df['year'] == y]['month'].unique().tolist()) for y in years}
-    return available
+    _, years, months = decoded_times(ds)
+    return {int(y): sorted(set(months[years == y].tolist()))
+            for y in np.unique(years)}
 
 def get_available_dates(ds):
     """Get list of available dates from dataset"""
-    times = pd.to_datetime(ds.time.values)
+    times, _, _ = decoded_times(ds)
     return sorted(times)
 
 def get_data_for_date(ds, date):
     """Extract data for a specific date"""
-    return ds.sel(time=date, method='nearest')
+    times, _, _ = decoded_times(ds)
+    i = times.get_indexer([pd.Timestamp(date)], method='nearest')[0]
+    return ds.isel(time=int(i))
 
 def calculate_wind_speed(u, v):
     """Calculate wind speed from u and v components"""
-    return np.sqrt(u**2 + v**2)
+    if isinstance(u, xr.DataArray):
+        # Fused single-pass ufunc; propagates through dask graphs lazily
+        return xr.apply_ufunc(np.hypot, u, v,
+                              dask='parallelized', output_dtypes=[u.dtype])
+    return np.hypot(u, v)
+
+# Fastmath subset without nnan/ninf: the kernels must let NaN cells
+# propagate, and the full flag set allows LLVM to assume NaNs away
+_FASTMATH_FLAGS = {'contract', 'reassoc', 'nsz', 'arcp'}
+
+if NUMBA_AVAILABLE:
+    # Fused single-pass kernels over flat contiguous views: each element is
+    # touched once and LLVM vectorizes the exp/atan2 chains
+    @njit(parallel=True, fastmath=_FASTMATH_FLAGS, cache=True)
+    def _rh_flat(t2m, d2m, out):
+        for i in prange(t2m.size):
+            tc = t2m[i] - 273.15
+            dc = d2m[i] - 273.15
+            r = (100.0 * math.exp(17.625 * dc / (243.04 + dc))
+                 / math.exp(17.625 * tc / (243.04 + tc)))
+            if r < 0.0:
+                r = 0.0
+            if r > 100.0:
+                r = 100.0
+            out[i] = r
+
+    @njit(parallel=True, fastmath=_FASTMATH_FLAGS, cache=True)
+    def _wind_dir_flat(u, v, out):
+        for i in prange(u.size):
+            out[i] = (180.0 / math.pi) * math.atan2(u[i], v[i]) + 180.0
+
+def _wind_dir_kernel(u, v):
+    """Wind direction in degrees over plain arrays"""
+    if NUMBA_AVAILABLE:
+        u = np.ascontiguousarray(u, dtype=np.float64)
+        v = np.ascontiguousarray(v, dtype=np.float64)
+        out = np.empty_like(u)
+        _wind_dir_flat(u.ravel(), v.ravel(), out.ravel())
+        return out
+    return (180 / np.pi) * np.arctan2(u, v) + 180
 
 def calculate_wind_direction(u, v):
     """Calculate wind direction in degrees"""
-    direction = (180 / np.pi) * np.arctan2(u, v) + 180
-    return direction
+    if isinstance(u, xr.DataArray):
+        return xr.apply_ufunc(_wind_dir_kernel, u, v,
+                              dask='parallelized', output_dtypes=[np.float64])
+    return _wind_dir_kernel(u, v)
+
+def _rh_kernel(t2m, d2m):
+    """Magnus RH formula over plain arrays
+
+    With numba the whole expression runs as one compiled pass; the NumPy
+    fallback computes in place with three buffers instead of the ~seven
+    that the naive expression produces. Either way the kernel is
+    memory-bound so fewer passes track bandwidth savings directly.
+    """
+    if NUMBA_AVAILABLE:
+        t2m = np.ascontiguousarray(t2m, dtype=np.float64)
+        d2m = np.ascontiguousarray(d2m, dtype=np.float64)
+        out = np.empty_like(t2m)
+        _rh_flat(t2m.ravel(), d2m.ravel(), out.ravel())
+        return out
+
+    num = d2m - 273.15
+    t_c = t2m - 273.15
+    scale = num + 243.04
+    num *= 17.625
+    num /= scale
+    np.exp(num, out=num)
+    np.add(t_c, 243.04, out=scale)
+    t_c *= 17.625
+    t_c /= scale
+    np.exp(t_c, out=t_c)
+    num /= t_c
+    num *= 100.0
+    np.clip(num, 0.0, 100.0, out=num)
+    return num
 
 def calculate_relative_humidity(t2m, d2m):
     """Calculate relative humidity from temperature and dewpoint"""
-    t_c = t2m - 273.15
-    d_c = d2m - 273.15
-    rh = 100 * (np.exp((17.625 * d_c) / (243.04 + d_c)) / 
-                np.exp((17.625 * t_c) / (243.04 + t_c)))
-    return np.clip(rh, 0, 100)
+    if isinstance(t2m, xr.DataArray):
+        return xr.apply_ufunc(
+            _rh_kernel, t2m, d2m,
+            dask='parallelized', output_dtypes=[np.float64]
+        )
+    return _rh_kernel(np.asarray(t2m, dtype=np.float64),
+                      np.asarray(d2m, dtype=np.float64))
+
+def _rh_spatial_mean(ds):
+    """Fused RH + spatial mean: the reducing kernel runs per chunk, so the
+    full-resolution RH cube is never materialized"""
+    return xr.apply_ufunc(
+        lambda t, d: np.nanmean(_rh_kernel(t, d), axis=(-2, -1)),
+        ds['t2m'], ds['d2m'],
+        input_core_dims=[['latitude', 'longitude']] * 2,
+        dask='parallelized', output_dtypes=[np.float64]
+    )
+
+def _ws_spatial_mean(ds):
+    """Fused wind speed + spatial mean, same pattern as _rh_spatial_mean"""
+    return xr.apply_ufunc(
+        lambda u, v: np.nanmean(np.hypot(u, v), axis=(-2, -1)),
+        ds['u10'], ds['v10'],
+        input_core_dims=[['latitude', 'longitude']] * 2,
+        dask='parallelized', output_dtypes=[np.float64]
+    )
+
+def _temperature_series(ds, dims):
+    return ds['t2m'].mean(dim=dims).values - 273.15
+
+def _solar_series(ds, dims):
+    if 'ssrd' in ds:
+        return ds['ssrd'].mean(dim=dims).values / 1e6
+    return np.zeros(ds.sizes.get('time', 0))
+
+def _risk_series(ds, dims):
+    from risk_calculator import calculate_risk_index
+    return calculate_risk_index(ds)['risk'].mean(dim=dims).values
+
+# Single "variable -> spatial-mean series" dispatch table; replaces the
+# per-function if/elif ladders the trend helpers used to carry around
+SERIES_BUILDERS = {
+    'temperature': _temperature_series,
+    'relative_humidity': lambda ds, dims: _rh_spatial_mean(ds).values,
+    'solar_radiation': _solar_series,
+    'wind_speed': lambda ds, dims: _ws_spatial_mean(ds).values,
+    'risk_index': _risk_series,
+}
+
+# Spatial-mean time series cached per dataset identity; the dataset is
+# immutable for the lifetime of a session and the weakref guard above
+# catches id reuse if it is ever replaced
+_TIMESERIES_CACHE = {}
+
+def spatial_mean_timeseries(ds, date_key='time'):
+    """
+    Compute the spatial-mean time series for every display variable once
+    Returns a pandas.DataFrame indexed by time with one column per variable
+    """
+    cached = ident_cache_get(_TIMESERIES_CACHE, ds)
+    if cached is not None:
+        return cached
+
+    dims = ['latitude', 'longitude']
+    index, _, _ = decoded_times(ds, date_key)
+
+    data = {var: build(ds, dims) for var, build in SERIES_BUILDERS.items()}
+
+    df = pd.DataFrame(data, index=index)
+    ident_cache_put(_TIMESERIES_CACHE, ds, df)
+    return df
 
 def calculate_yearly_trend(ds, variable, year, date_key='time'):
     """
     Calculate temporal trend for a specific year only
     Returns monthly values for that year
     """
-    dates = pd.to_datetime(ds[date_key].values)
-    
-    # Filter only the selected year
-    year_mask = dates.year == year
-    year_dates = dates[year_mask]
-    
-    if len(year_dates) == 0:
-        return {'dates': [], 'values': [], 'months': []}
-    
     try:
-        if variable == 'risk_index':
-            values = []
-            for date in year_dates:
-                data_slice = ds.sel({date_key: date}, method='nearest')
-                from risk_calculator import calculate_risk_index
-                risk_data = calculate_risk_index(data_slice)
-                avg_risk = float(risk_data['risk'].mean().values)
-                values.append(avg_risk)
-            values = np.array(values)
-            
-        elif variable == 'temperature':
-            year_ds = ds.sel({date_key: year_dates})
-            values = (year_ds['t2m'].mean(dim=['latitude', 'longitude']).values - 273.15)
-            
-        elif variable == 'relative_humidity':
-            year_ds = ds.sel({date_key: year_dates})
-            rh = calculate_relative_humidity(year_ds['t2m'], year_ds['d2m'])
-            values = rh.mean(dim=['latitude', 'longitude']).values
-            
-        elif variable == 'solar_radiation':
-            year_ds = ds.sel({date_key: year_dates})
-            if 'ssrd' in year_ds:
-                values = year_ds['ssrd'].mean(dim=['latitude', 'longitude']).values / 1e6
-            else:
-                values = np.zeros(len(year_dates))
-                
-        elif variable == 'wind_speed':
-            year_ds = ds.sel({date_key: year_dates})
-            # Calculate wind SPEED (not direction)
-            ws = calculate_wind_speed(year_ds['u10'], year_ds['v10'])
-            values = ws.mean(dim=['latitude', 'longitude']).values
-            
-        else:
-            year_ds = ds.sel({date_key: year_dates})
-            values = (year_ds['t2m'].mean(dim=['latitude', 'longitude']).values - 273.15)
-        
-        # Extract month numbers for x-axis
-        months = [d.month for d in year_dates]
-        
-        return {'dates': year_dates, 'values': values, 'months': months}
-        
+        df = spatial_mean_timeseries(ds, date_key)
+        column = variable if variable in df.columns else 'temperature'
+        # Cached int16/int8 codes: single-byte compares, no fresh int64
+        # accessor arrays per rerun
+        _, years, months = decoded_times(ds, date_key)
+        rows = np.flatnonzero(years == year)
+
+        if rows.size == 0:
+            return {'dates': [], 'values': [], 'months': []}
+
+        return {
+            'dates': df.index[rows],
+            'values': df[column].values[rows],
+            'months': months[rows].tolist()
+        }
+
     except Exception as e:
         print(f"Error calculating yearly trend for {variable}: {e}")
-        return {'dates': year_dates, 'values': np.zeros(len(year_dates)), 'months': []}
+        return {'dates': [], 'values': [], 'months': []}
 
 def calculate_historical_average(ds, variable, start_year=2017, end_year=2024, date_key='time'):
     """
     Calculate monthly historical average from start_year to end_year
-    Returns average values for each month (1-12)
+    Returns a length-12 NumPy array of averages indexed by month (Jan..Dec)
     """
-    dates = pd.to_datetime(ds[date_key].values)
-    
-    # Filter years in range
-    mask = (dates.year >= start_year) & (dates.year <= end_year)
-    historical_dates = dates[mask]
-    
-    if len(historical_dates) == 0:
-        return {i: 0 for i in range(1, 13)}
-    
-    # Group by month and calculate averages
-    monthly_avgs = {}
-    
-    for month in range(1, 13):
-        month_dates = historical_dates[historical_dates.month == month]
-        if len(month_dates) == 0:
-            monthly_avgs[month] = np.nan
-            continue
-        
-        try:
-            if variable == 'risk_index':
-                values = []
-                for date in month_dates:
-                    data_slice = ds.sel({date_key: date}, method='nearest')
-                    from risk_calculator import calculate_risk_index
-                    risk_data = calculate_risk_index(data_slice)
-                    avg_risk = float(risk_data['risk'].mean().values)
-                    values.append(avg_risk)
-                monthly_avgs[month] = np.nanmean(values)
-                
-            elif variable == 'temperature':
-                month_ds = ds.sel({date_key: month_dates})
-                monthly_avgs[month] = float((month_ds['t2m'].mean(dim=['latitude', 'longitude']).mean().values - 273.15))
-                
-            elif variable == 'relative_humidity':
-                month_ds = ds.sel({date_key: month_dates})
-                rh = calculate_relative_humidity(month_ds['t2m'], month_ds['d2m'])
-                monthly_avgs[month] = float(rh.mean(dim=['latitude', 'longitude']).mean().values)
-                
-            elif variable == 'solar_radiation':
-                month_ds = ds.sel({date_key: month_dates})
-                if 'ssrd' in month_ds:
-                    monthly_avgs[month] = float(month_ds['ssrd'].mean(dim=['latitude', 'longitude']).mean().values / 1e6)
-                else:
-                    monthly_avgs[month] = 0
-
-            elif variable == 'wind_speed':
-                month_ds = ds.sel({date_key: month_dates})
-                # Calculate wind SPEED for historical average
-                ws = calculate_wind_speed(month_ds['u10'], month_ds['v10'])
-                monthly_avgs[month] = float(ws.mean(dim=['latitude', 'longitude']).mean().values)
-                
-            else:
-                month_ds = ds.sel({date_key: month_dates})
-                monthly_avgs[month] = float((month_ds['t2m'].mean(dim=['latitude', 'longitude']).mean().values - 273.15))
-                
-        except Exception as e:
-            print(f"Error calculating average for month {month}: {e}")
-            monthly_avgs[month] = np.nan
-    
+    monthly_avgs = np.full(12, np.nan)
+
+    try:
+        df = spatial_mean_timeseries(ds, date_key)
+        column = variable if variable in df.columns else 'temperature'
+        _, years, months = decoded_times(ds, date_key)
+        rows = np.flatnonzero((years >= start_year) & (years <= end_year))
+
+        if rows.size == 0:
+            return monthly_avgs
+
+        # Grouped mean via bincount on the compact month codes
+        sel_months = months[rows].astype(np.intp) - 1
+        values = df[column].values[rows]
+        sums = np.bincount(sel_months, weights=values, minlength=12)
+        counts = np.bincount(sel_months, minlength=12)
+        has_data = counts > 0
+        monthly_avgs[has_data] = sums[has_data] / counts[has_data]
+
+    except Exception as e:
+        print(f"Error calculating historical average for {variable}: {e}")
+
     return monthly_avgs
 
 def calculate_temporal_trend(ds, variable, date_key='time'):
     """Calculate temporal trend for a variable"""
-    dates = pd.to_datetime(ds[date_key].values)
-    
     try:
-        if variable == 'risk_index':
-            values = []
-            for date in dates:
-                data_slice = ds.sel({date_key: date}, method='nearest')
-                from risk_calculator import calculate_risk_index
-                risk_data = calculate_risk_index(data_slice)
-                avg_risk = float(risk_data['risk'].mean().values)
-                values.append(avg_risk)
-            values = np.array(values)
-        elif variable == 'temperature':
-            values = (ds['t2m'].mean(dim=['latitude', 'longitude']).values - 273.15)
-        elif variable == 'relative_humidity':
-            rh = calculate_relative_humidity(ds['t2m'], ds['d2m'])
-            values = rh.mean(dim=['latitude', 'longitude']).values
-        elif variable == 'solar_radiation':
-            if 'ssrd' in ds:
-                values = ds['ssrd'].mean(dim=['latitude', 'longitude']).values / 1e6
-            else:
-                values = np.zeros(len(dates))
-        elif variable == 'wind_speed':
-            ws = calculate_wind_speed(ds['u10'], ds['v10'])
-            values = ws.mean(dim=['latitude', 'longitude']).values
-        else:
-            values = (ds['t2m'].mean(dim=['latitude', 'longitude']).values - 273.15)
-        
-        return {'dates': dates, 'values': values}
+        df = spatial_mean_timeseries(ds, date_key)
+        column = variable if variable in df.columns else 'temperature'
+        return {'dates': df.index, 'values': df[column].values}
     except Exception as e:
+        dates, _, _ = decoded_times(ds, date_key)
         print(f"Error calculating trend for {variable}: {e}")
         return {'dates': dates, 'values': np.zeros(len(dates))}
-    
+
+def _load_fire_data_arrow():
+    """Predicate-pushdown read: only row groups matching the Galicia filter
+    are decoded, after a one-time CSV -> Parquet conversion"""
+    from datetime import date
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    import pyarrow.dataset as pa_ds
+
+    parquet_path = 'data/fires.parquet'
+    if not os.path.exists(parquet_path):
+        pq.write_table(pa_csv.read_csv('data/fires-all.csv'), parquet_path)
+
+    filt = (
+        (pa_ds.field('superficie') > 10) &
+        (pa_ds.field('lat') > 41.78) & (pa_ds.field('lat') < 43.3) &
+        (pa_ds.field('lng') > -9.7) & (pa_ds.field('lng') < -6.7) &
+        # 'fecha' parses as date32, which pyarrow won't compare against
+        # a string — the predicate needs a real date
+        (pa_ds.field('fecha') >= date(2017, 1, 1))
+    )
+    table = pa_ds.dataset(parquet_path).to_table(
+        filter=filt, columns=['fecha', 'lat', 'lng', 'superficie'])
+
+    fires = table.to_pandas()
+    fires['fecha'] = pd.to_datetime(fires['fecha'])
+    for col in ('lat', 'lng', 'superficie'):
+        fires[col] = fires[col].astype(np.float32)
+    return fires
+
+def _load_fire_data_pandas():
+    """Fallback: full CSV parse plus in-memory filter"""
+    fires_df = pd.read_csv('data/fires-all.csv')
+
+    # Filter for Galicia, fires > 10 hectares, from 2017 onwards
+    fires_galicia = fires_df[
+        (fires_df['superficie'] > 10) &
+        (fires_df['lat'] > 41.78) &
+        (fires_df['lat'] < 43.3) &
+        (fires_df['lng'] > -9.7) &
+        (fires_df['lng'] < -6.7) &
+        (fires_df['fecha'] >= '2017-01-01')
+    ].copy()
+
+    fires_galicia['fecha'] = pd.to_datetime(fires_galicia['fecha'])
+    return fires_galicia
+
 def load_fire_data():
     """Load and filter fire data for Galicia region"""
     try:
-        import pandas as pd
-        
-        fires_df = pd.read_csv('data/fires-all.csv')
-        
-        # Filter for Galicia, fires > 10 hectares, from 2017 onwards
-        fires_galicia = fires_df[
-            (fires_df['superficie'] > 10) & 
-            (fires_df['lat'] > 41.78) & 
-            (fires_df['lat'] < 43.3) & 
-            (fires_df['lng'] > -9.7) & 
-            (fires_df['lng'] < -6.7) & 
-            (fires_df['fecha'] >= '2017-01-01')
-        ].copy()
-        
-        # Convert fecha to datetime
-        fires_galicia['fecha'] = pd.to_datetime(fires_galicia['fecha'])
-        
+        try:
+            fires_galicia = _load_fire_data_arrow()
+        except Exception as e:
+            print(f"Warning: arrow fire load failed ({e}), using pandas")
+            fires_galicia = _load_fire_data_pandas()
+
+        # Sorted DatetimeIndex so month views are binary-search slices
+        # ('fecha' stays as a column for the per-row code paths)
+        fires_galicia = fires_galicia.sort_values('fecha')
+        fires_galicia = fires_galicia.set_index(
+            pd.DatetimeIndex(fires_galicia['fecha']))
+
         print(f"Loaded {len(fires_galicia)} fire records for Galicia (>10ha, 2017+)")
         return fires_galicia
-        
+
     except Exception as e:
         print(f"Error loading fire data: {e}")
         return pd.DataFrame()
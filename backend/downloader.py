@@ -1,7 +1,7 @@
 import cdsapi
-import zipfile
 import os
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 def download_galicia_data():
@@ -30,9 +30,6 @@ def download_galicia_data():
             )
         print("✓ Using credentials from environment variables")
     
-    # Initialize CDS API client with explicit credentials
-    client = cdsapi.Client(url=cds_url, key=cds_key)
-    
     dataset = "reanalysis-era5-single-levels-monthly-means"
     request = {
         "product_type": ["monthly_averaged_reanalysis"],
@@ -65,11 +62,6 @@ def download_galicia_data():
             "standard_deviation_of_orography",
             "total_column_water_vapour"
         ],
-        "year": [
-            "2017", "2018", "2019",
-            "2020", "2021", "2022",
-            "2023", "2024", "2025"
-        ],
         "month": [
             "01", "02", "03",
             "04", "05", "06",
@@ -79,23 +71,31 @@ def download_galicia_data():
         "time": ["00:00"],
         "data_format": "netcdf",
         "download_format": "unarchived",
+        # Pin the native 0.25° grid so the server skips regridding
+        "grid": ["0.25", "0.25"],
         "area": [43.8, -9.3, 42.0, -6.7]  # Galicia bounds [N, W, S, E]
     }
     
-    # Download to zip file
-    zip_path = 'data/galicia_era5_data.zip'
-    
+    years = [
+        "2017", "2018", "2019",
+        "2020", "2021", "2022",
+        "2023", "2024", "2025"
+    ]
+
+    # One client for all split requests: cdsapi wraps a requests.Session,
+    # so the HTTPS connection is reused instead of re-negotiated per year
+    client = cdsapi.Client(url=cds_url, key=cds_key)
+
+    def retrieve_year(year):
+        target = f'data/galicia_era5_{year}.nc'
+        client.retrieve(dataset, {**request, "year": [year]}, target)
+        return target
+
     print("📥 Descargando datos (esto puede tardar varios minutos)...")
-    client.retrieve(dataset, request, zip_path)
-    
-    print(f"✅ Descarga completada: {zip_path}")
-    
-    # Extract all .nc files
-    print("📦 Extrayendo archivos NetCDF...")
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall("data")
-    
-    print("✅ Archivos extraídos exitosamente en data/")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {executor.submit(retrieve_year, y): y for y in years}
+        for future in as_completed(futures):
+            print(f"✅ Descarga completada: {future.result()}")
     
     # List downloaded files
     nc_files = [f for f in os.listdir('data') if f.endswith('.nc')]
@@ -104,8 +104,64 @@ def download_galicia_data():
         size_mb = os.path.getsize(f'data/{f}') / (1024 * 1024)
         print(f"  - {f} ({size_mb:.2f} MB)")
     
+    # Consolidate into a single zarr store for fast lazy opens
+    build_zarr_store()
+
     print("\n🎉 ¡Datos listos para usar!")
 
 
+def build_zarr_store():
+    """
+    Consolidate the downloaded NetCDF files into a single float32 zarr store
+
+    Opening the app then costs one consolidated-metadata read instead of
+    scanning every NetCDF header, and float32 halves the bytes per value.
+    """
+    import shutil
+    from glob import glob
+    import numpy as np
+    import xarray as xr
+    import data_processor as dp
+    from data_processor import preprocess_rename_time
+
+    files = sorted(glob('data/*.nc'))
+    if not files:
+        print("⚠️ No hay archivos NetCDF para consolidar")
+        return
+
+    print("🗜️ Consolidando datos en data/galicia.zarr...")
+    merged = xr.open_mfdataset(
+        files,
+        engine='netcdf4',
+        combine='by_coords',
+        compat='no_conflicts',
+        parallel=True,
+        preprocess=preprocess_rename_time
+    )
+    # Dataset.astype takes a single dtype, not a per-variable mapping,
+    # so cast the float64 variables one by one
+    for v in merged.data_vars:
+        if merged[v].dtype == 'float64':
+            merged[v] = merged[v].astype('float32')
+
+    # Bake the derived fields in once at build time: wind speed is
+    # cheap but relative humidity costs a transcendental per cell, and
+    # every consumer reads them on every month
+    merged['ws'] = dp.calculate_wind_speed(
+        merged['u10'], merged['v10']).astype(np.float32)
+    merged['rh'] = dp.calculate_relative_humidity(
+        merged['t2m'], merged['d2m']).astype(np.float32)
+
+    if os.path.isdir('data/galicia.zarr'):
+        shutil.rmtree('data/galicia.zarr')
+
+    # Full time axis per chunk so trend reductions read each chunk once
+    merged.chunk({'time': -1, 'latitude': 32, 'longitude': 32}).to_zarr(
+        'data/galicia.zarr', mode='w', consolidated=True
+    )
+    merged.close()
+    print("✅ Zarr listo: data/galicia.zarr")
+
+
 if __name__ == '__main__':
     download_galicia_data()
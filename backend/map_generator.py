@@ -1,9 +1,235 @@
+import json
+
 import folium
 from folium import plugins
 import numpy as np
-from matplotlib import cm, colors
-from scipy.ndimage import zoom
+import pandas as pd
+import xarray as xr
+from matplotlib import cm
 from branca.colormap import LinearColormap
+from branca.element import MacroElement
+from jinja2 import Template
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Fixed variable -> colormap / label tables, resolved once at import so
+# renders never touch the matplotlib registry
+_VAR_CMAPS = {
+    'risk_index': 'YlOrRd',
+    'temperature': 'RdYlBu_r',
+    'relative_humidity': 'Blues',
+    'solar_radiation': 'YlOrRd',
+    'wind_speed': 'viridis'
+}
+_VAR_LABELS = {
+    'risk_index': 'Índice de Riesgo',
+    'temperature': 'Temperatura (°C)',
+    'relative_humidity': 'Humedad Relativa (%)',
+    'solar_radiation': 'Radiación Solar (J/m²)',
+    'wind_speed': 'Velocidad de Viento (m/s)'
+}
+_CMAPS = {name: cm.get_cmap(name) for name in set(_VAR_CMAPS.values())}
+
+# 256-slot RGB palettes, sampled once per colormap; slot 0 is reserved
+# for the transparent NaN index
+_CMAP_PAL_CACHE = {}
+
+def _get_cmap_palette(colormap_name):
+    pal = _CMAP_PAL_CACHE.get(colormap_name)
+    if pal is None:
+        cmap = _CMAPS.get(colormap_name)
+        if cmap is None:
+            cmap = cm.get_cmap(colormap_name)
+        rgb = (cmap(np.linspace(0, 1, 255))[:, :3] * 255).astype(np.uint8)
+        pal = b'\x00\x00\x00' + rgb.tobytes()
+        _CMAP_PAL_CACHE[colormap_name] = pal
+    return pal
+
+# Fastmath without nnan/ninf: the kernel branches on np.isnan, which
+# the full flag set would allow LLVM to fold to false
+_FASTMATH_FLAGS = {'contract', 'reassoc', 'nsz', 'arcp'}
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=_FASTMATH_FLAGS, cache=True)
+    def _apply_cmap_idx(data, vmin, vmax, out):
+        inv = 1.0 / (vmax - vmin)
+        for i in prange(data.shape[0]):
+            for j in range(data.shape[1]):
+                v = data[i, j]
+                if np.isnan(v):
+                    out[i, j] = 0
+                else:
+                    t = (v - vmin) * inv
+                    if t < 0.0:
+                        t = 0.0
+                    elif t > 1.0:
+                        t = 1.0
+                    out[i, j] = np.uint8(t * 254.0 + 1.0)
+
+def _colorize_indexed(data_upsampled, vmin, vmax, colormap_name):
+    """uint8 palette indices for the upsampled grid, 0 meaning NaN
+
+    One byte per pixel instead of four: the colors live in the PNG
+    palette chunk, so deflate and base64 work on a quarter of the data.
+    The colormap was already quantized to a discrete LUT, so the 255
+    usable levels lose nothing visible. Numba fuses clamp + index in a
+    single pass; the NumPy fallback does the same with three temporaries.
+    """
+    if NUMBA_AVAILABLE:
+        data = np.ascontiguousarray(data_upsampled, dtype=np.float64)
+        idx = np.empty(data.shape, np.uint8)
+        _apply_cmap_idx(data, vmin, vmax, idx)
+        return idx
+
+    mask = np.isnan(data_upsampled)
+    t = np.clip((np.where(mask, vmin, data_upsampled) - vmin) / (vmax - vmin),
+                0.0, 1.0)
+    idx = (t * 254.0 + 1.0).astype(np.uint8)
+    idx[mask] = 0
+    return idx
+
+
+def _upsample(data_values, zoom_factor=5):
+    """Bilinear upsample preserving NaN holes
+
+    OpenCV's SIMD resize is much faster than scipy.ndimage.zoom and does
+    not smear NaNs across the coastline: the gaps are resized separately
+    as a nearest-neighbour mask and punched back in. Falls back to an
+    FFT zero-pad upsample when OpenCV is not installed.
+    """
+    if CV2_AVAILABLE:
+        h, w = data_values.shape
+        size = (w * zoom_factor, h * zoom_factor)
+        mask = np.isnan(data_values).astype(np.uint8)
+        filled = np.where(mask, 0, data_values).astype(np.float32)
+        up = cv2.resize(filled, size, interpolation=cv2.INTER_LINEAR)
+        up_mask = cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
+        return np.where(up_mask.astype(bool), np.nan, up)
+    return _fft_upsample(data_values, zoom_factor)
+
+
+def _fft_upsample(data_values, zoom_factor):
+    """Zero-pad upsample in the frequency domain
+
+    ERA5 fields are smooth/band-limited, so padding the rFFT spectrum and
+    inverting reproduces them without the edge artifacts of spatial
+    interpolation, and pocketfft's SIMD transforms are faster than
+    ndimage at these sizes. NaN holes are re-punched at block resolution.
+    """
+    from scipy.fft import rfft2, irfft2
+
+    h, w = data_values.shape
+    H, W = h * zoom_factor, w * zoom_factor
+    mask = np.isnan(data_values)
+    fill = float(np.nanmean(data_values)) if mask.any() else 0.0
+
+    F = rfft2(np.nan_to_num(data_values, nan=fill))
+    Fp = np.zeros((H, W // 2 + 1), dtype=complex)
+    top = (h + 1) // 2
+    bottom = h // 2
+    Fp[:top, :w // 2 + 1] = F[:top]
+    if bottom:
+        Fp[-bottom:, :w // 2 + 1] = F[-bottom:]
+    up = irfft2(Fp, s=(H, W)) * (zoom_factor ** 2)
+
+    if mask.any():
+        up_mask = np.repeat(np.repeat(mask, zoom_factor, axis=0),
+                            zoom_factor, axis=1)
+        up[up_mask] = np.nan
+    return up
+
+
+class BulkCircleMarkers(MacroElement):
+    """All measurement-point markers in one script block
+
+    A single JSON array consumed by a client-side loop replaces one
+    branca element per marker, so the Jinja render pass no longer scales
+    with the marker count.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var points_{{ this.get_name() }} = {{ this.points_json }};
+        for (var k = 0; k < points_{{ this.get_name() }}.length; k++) {
+            var p = points_{{ this.get_name() }}[k];
+            L.circleMarker([p.lat, p.lon], {
+                radius: 5,
+                color: 'white',
+                weight: 1,
+                fill: true,
+                fillColor: p.color,
+                fillOpacity: 0.8
+            }).bindPopup(p.popup, {maxWidth: 250}).addTo({{ this._parent.get_name() }});
+        }
+        {% endmacro %}
+        """)
+
+    def __init__(self, points):
+        super().__init__()
+        self._name = 'BulkCircleMarkers'
+        self.points_json = json.dumps(points)
+
+
+def _fires_for_month(fires_data, year, month):
+    """Month view of the fires table
+
+    The loader sets a sorted DatetimeIndex, so the partial-string .loc
+    is a binary search over the index instead of two full-column .dt
+    scans plus a boolean mask. Frames without the index (e.g. built in
+    tests or notebooks) fall back to the mask path.
+    """
+    if isinstance(fires_data.index, pd.DatetimeIndex):
+        try:
+            return fires_data.loc[f'{year}-{month:02d}']
+        except KeyError:
+            return fires_data.iloc[0:0]
+    fecha = fires_data['fecha']
+    return fires_data[(fecha.dt.year == year) & (fecha.dt.month == month)]
+
+
+# Threshold/palette tables backing the vectorized get_colors
+_COLOR_THRESH = {
+    'risk_index': np.array([0.3, 0.6]),
+    'temperature': np.array([20.0, 30.0]),
+}
+_COLOR_PALETTE = {
+    'risk_index': np.array(['#2ecc71', '#f39c12', '#e74c3c']),
+    'temperature': np.array(['#3498db', '#f39c12', '#e74c3c']),
+}
+
+
+# Shared popup template for the marker loop: one %-substitution per
+# point instead of rebuilding an f-string with per-field __format__
+# dispatch on every iteration
+_MARKER_TPL = """
+            <div style="font-family: Arial; width: 220px;">
+                <h4 style="margin:0; color: #2c3e50;">📍 Punto de Medición</h4>
+                <hr style="margin: 5px 0;">
+                <b>Coordenadas:</b> %.2f, %.2f<br>
+                <b style="color: %s;">🔥 Riesgo:</b> %.2f<br>
+                <b>🌡️ Temperatura:</b> %.1f°C<br>
+                <b>💧 Humedad:</b> %.1f%%<br>
+            </div>
+            """
+
+
+def get_colors(values, variable='risk_index'):
+    """Vectorized get_color: one searchsorted per array instead of a
+    Python if/elif chain per value"""
+    values = np.asarray(values)
+    thresh = _COLOR_THRESH.get(variable)
+    if thresh is None:
+        return np.full(values.shape, '#95a5a6')
+    return _COLOR_PALETTE[variable][np.searchsorted(thresh, values, side='right')]
 
 
 def get_color(value, variable='risk_index'):
@@ -28,55 +254,166 @@ def get_color(value, variable='risk_index'):
 
 def get_colormap_for_variable(variable):
     """Return appropriate matplotlib colormap for each variable"""
-    colormaps = {
-        'risk_index': 'YlOrRd',
-        'temperature': 'RdYlBu_r',
-        'relative_humidity': 'Blues',
-        'solar_radiation': 'YlOrRd',
-        'wind_speed': 'viridis'
-    }
-    return colormaps.get(variable, 'coolwarm')
+    return _VAR_CMAPS.get(variable, 'coolwarm')
 
 
 def get_variable_label(variable):
     """Return Spanish label for variable"""
-    labels = {
-        'risk_index': 'Índice de Riesgo',
-        'temperature': 'Temperatura (°C)',
-        'relative_humidity': 'Humedad Relativa (%)',
-        'solar_radiation': 'Radiación Solar (J/m²)',
-        'wind_speed': 'Velocidad de Viento (m/s)'
-    }
-    return labels.get(variable, 'Variable')
-
-
-def create_interactive_map(risk_data, data_slice, variable='risk_index', date=None, 
-                          show_fires=False, fires_data=None, dataset=None, date_key='time'):
-    """Create interactive Folium map with smooth heatmap overlay"""
+    return _VAR_LABELS.get(variable, 'Variable')
+
+
+
+def _add_heat_layer(m, data_to_plot, data_values):
+    """Ship the raw grid as weighted points for client-side rasterization
+
+    ~N*3 floats instead of a base64 PNG: Leaflet.heat rasterizes on the
+    client canvas, so the server-side upsample/colorize/encode chain is
+    skipped entirely.
+    """
+    lat_g, lon_g = np.meshgrid(data_to_plot.latitude.values,
+                               data_to_plot.longitude.values, indexing='ij')
+    flat = data_values.ravel()
+    valid = ~np.isnan(flat)
+
+    vmin, vmax = np.nanpercentile(data_values, [2.0, 98.0])
+    if not np.isfinite(vmin) or not np.isfinite(vmax) or vmin >= vmax:
+        vmin = float(np.nanmin(data_values))
+        vmax = float(np.nanmax(data_values))
+        if vmin >= vmax:
+            vmax = vmin + 0.01
+
+    weights = np.clip((flat[valid] - vmin) / (vmax - vmin), 0.0, 1.0)
+    heat_points = np.column_stack(
+        [lat_g.ravel()[valid], lon_g.ravel()[valid], weights]).tolist()
+    plugins.HeatMap(heat_points, min_opacity=0.2, radius=18,
+                    blur=25, max_zoom=12).add_to(m)
+
+
+def _add_image_overlay(m, data_values, variable, colormap_name, bounds):
+    """Upsample, colorize and attach the raster overlay
+
+    Returns False (with an on-map message) when too little data survives
+    interpolation to be worth drawing.
+    """
+    # Interpolate for smoother heatmap. The factor adapts to the
+    # on-screen size: past zoom ~10 (the deepest zoom users reach in
+    # practice, map max is 12) extra raster resolution is never
+    # displayed, so grids already denser than that skip the resize and
+    # the proportional PNG-encode cost entirely.
+    pix_per_deg = 256 * (2 ** 10) / 360.0
+    lat_span = bounds[1][0] - bounds[0][0]
+    lon_span = bounds[1][1] - bounds[0][1]
+    target_pixels = (lat_span * pix_per_deg) * (lon_span * pix_per_deg)
+    zoom_factor = max(1, min(5, int(np.ceil(np.sqrt(
+        target_pixels / data_values.size)))))
+    if zoom_factor == 1:
+        data_upsampled = data_values
+    else:
+        data_upsampled = _upsample(data_values, zoom_factor=zoom_factor)
+
+    # Check valid data percentage after interpolation
+    valid_percentage = np.sum(~np.isnan(data_upsampled)) / data_upsampled.size * 100
+    
+    if valid_percentage < 10:
+        html_msg = f"""
+        <div style="position: fixed; top: 100px; left: 50%; transform: translateX(-50%); 
+                    background: white; padding: 20px; border-radius: 10px; 
+                    box-shadow: 0 4px 8px rgba(0,0,0,0.2); z-index: 1000; max-width: 400px;">
+            <h4 style="margin:0; color: #f39c12;">⚠️ Datos Insuficientes</h4>
+            <p style="margin: 10px 0 0 0;">Solo {valid_percentage:.1f}% de los datos están disponibles para esta fecha.</p>
+            <p style="margin: 5px 0 0 0; font-size: 12px; color: #666;">
+                Selecciona otro mes para ver más datos.
+            </p>
+        </div>
+        """
+        m.get_root().html.add_child(folium.Element(html_msg))
+        return False
+    
+    # Normalize values
+    if variable == 'solar_radiation':
+        vmin = float(np.nanmin(data_upsampled))
+        vmax = float(np.nanmax(data_upsampled))
+    else:
+        # One nanpercentile call: no masked copy, one internal partition
+        vmin, vmax = np.nanpercentile(data_upsampled, [2.0, 98.0])
+        vmin = float(vmin)
+        vmax = float(vmax)
+    
+    # Ensure vmin < vmax
+    if np.isnan(vmin) or np.isnan(vmax) or vmin >= vmax:
+        vmin = float(np.nanmin(data_upsampled))
+        vmax = float(np.nanmax(data_upsampled))
+        if np.isnan(vmin) or np.isnan(vmax) or vmin >= vmax:
+            vmax = vmin + 0.01 if not np.isnan(vmin) else 1.0
+            vmin = 0.0 if np.isnan(vmin) else vmin
+    
+    if not (vmin < vmax):
+        vmin = 0.0
+        vmax = 1.0
+    
+    # Apply colormap as palette indices (0 = NaN, rendered transparent)
+    idx_array = _colorize_indexed(data_upsampled, vmin, vmax, colormap_name)
+
+    # Pre-encode the overlay as an indexed PNG: deflate shrinks the
+    # smooth colormap 10-50x versus the raw array branca would inline,
+    # and mode 'P' feeds it one byte per pixel instead of four
+    from PIL import Image
+    import io
+    import base64
+
+    img = Image.fromarray(idx_array, 'P')
+    img.putpalette(_get_cmap_palette(colormap_name))
+    buf = io.BytesIO()
+    img.save(buf, 'PNG', transparency=0)
+    overlay_url = 'data:image/png;base64,' + base64.b64encode(buf.getvalue()).decode()
+
+    # Add ImageOverlay
+    folium.raster_layers.ImageOverlay(
+        image=overlay_url,
+        bounds=bounds,
+        opacity=0.65,
+        interactive=True,
+        name='Heatmap'
+    ).add_to(m)
+    return True
+
+
+def create_interactive_map(risk_data, data_slice, variable='risk_index', date=None,
+                          show_fires=False, fires_data=None, dataset=None, date_key='time',
+                          use_heatmap=False):
+    """Create interactive Folium map with smooth heatmap overlay
+
+    With use_heatmap=True the grid ships as a small list of weighted
+    points rasterized client-side by Leaflet.heat instead of a base64
+    PNG; the image overlay stays the default because it carries the
+    per-variable colormaps the colorbar is calibrated against.
+    """
     
     # Center on Galicia
     center_lat, center_lon = 42.88, -8.0
     
     # Create map with zoom constraints
+    # prefer_canvas makes Leaflet draw the many circle markers on a single
+    # canvas instead of one SVG DOM node each, keeping client FPS up
     m = folium.Map(
         location=[center_lat, center_lon],
         zoom_start=8,
         min_zoom=7,
         max_zoom=12,
         tiles='CartoDB Positron',
-        max_bounds=True
+        max_bounds=True,
+        prefer_canvas=True
     )
     
-    # Get data to display based on variable
+    # Get data to display based on variable; colormap comes from the
+    # import-time table
+    colormap_name = _VAR_CMAPS.get(variable, 'YlOrRd')
     if variable == 'risk_index':
         data_to_plot = risk_data['risk']
-        colormap_name = 'YlOrRd'
     elif variable == 'temperature':
         data_to_plot = risk_data['temperature']
-        colormap_name = 'RdYlBu_r'
     elif variable == 'relative_humidity':
         data_to_plot = risk_data['relative_humidity']
-        colormap_name = 'Blues'
     elif variable == 'solar_radiation':
         # Try multiple sources with validation
         data_to_plot = None
@@ -100,14 +437,10 @@ def create_interactive_map(risk_data, data_slice, variable='risk_index', date=No
         # Final fallback
         if data_to_plot is None:
             data_to_plot = risk_data['temperature']
-        
-        colormap_name = 'YlOrRd'
     elif variable == 'wind_speed':
         data_to_plot = risk_data['wind_speed']
-        colormap_name = 'viridis'
     else:
         data_to_plot = risk_data['risk']
-        colormap_name = 'YlOrRd'
     
     # Initialize colorbar_html
     colorbar_html = ""
@@ -120,11 +453,12 @@ def create_interactive_map(risk_data, data_slice, variable='risk_index', date=No
         if data_values is None or len(data_values) == 0:
             return m
         
-        # Calculate NaN percentage
-        nan_percentage = np.sum(np.isnan(data_values)) / data_values.size * 100
-        
+        # One isnan pass covers both the percentage and the all-NaN check
+        nan_count = int(np.isnan(data_values).sum())
+        nan_percentage = nan_count / data_values.size * 100
+
         # Check if ALL values are NaN
-        if np.all(np.isnan(data_values)):
+        if nan_count == data_values.size:
             html_msg = f"""
             <div style="position: fixed; top: 100px; left: 50%; transform: translateX(-50%); 
                         background: white; padding: 20px; border-radius: 10px; 
@@ -139,75 +473,23 @@ def create_interactive_map(risk_data, data_slice, variable='risk_index', date=No
             m.get_root().html.add_child(folium.Element(html_msg))
             return m
         
-        # Get coordinate bounds
-        lat_min = float(data_to_plot.latitude.min().values)
-        lat_max = float(data_to_plot.latitude.max().values)
-        lon_min = float(data_to_plot.longitude.min().values)
-        lon_max = float(data_to_plot.longitude.max().values)
+        # Get coordinate bounds: the coords are monotonic 1D indexes, so
+        # the extremes are the endpoints — no reduction kernels needed
+        lats = data_to_plot.latitude.values
+        lons = data_to_plot.longitude.values
+        lat_min, lat_max = sorted((float(lats[0]), float(lats[-1])))
+        lon_min, lon_max = sorted((float(lons[0]), float(lons[-1])))
         
         # Set map bounds to data extent
         m.fit_bounds([[lat_min, lon_min], [lat_max, lon_max]])
-        
-        # Interpolate for smoother heatmap
-        zoom_factor = 5
-        data_upsampled = zoom(data_values, (zoom_factor, zoom_factor), order=1)
-        
-        # Check valid data percentage after interpolation
-        valid_percentage = np.sum(~np.isnan(data_upsampled)) / data_upsampled.size * 100
-        
-        if valid_percentage < 10:
-            html_msg = f"""
-            <div style="position: fixed; top: 100px; left: 50%; transform: translateX(-50%); 
-                        background: white; padding: 20px; border-radius: 10px; 
-                        box-shadow: 0 4px 8px rgba(0,0,0,0.2); z-index: 1000; max-width: 400px;">
-                <h4 style="margin:0; color: #f39c12;">⚠️ Datos Insuficientes</h4>
-                <p style="margin: 10px 0 0 0;">Solo {valid_percentage:.1f}% de los datos están disponibles para esta fecha.</p>
-                <p style="margin: 5px 0 0 0; font-size: 12px; color: #666;">
-                    Selecciona otro mes para ver más datos.
-                </p>
-            </div>
-            """
-            m.get_root().html.add_child(folium.Element(html_msg))
-            return m
-        
-        # Normalize values
-        if variable == 'solar_radiation':
-            vmin = float(np.nanmin(data_upsampled))
-            vmax = float(np.nanmax(data_upsampled))
+
+        if use_heatmap and variable != 'wind_speed':
+            _add_heat_layer(m, data_to_plot, data_values)
         else:
-            valid_data = data_upsampled[~np.isnan(data_upsampled)]
-            vmin = float(np.percentile(valid_data, 2))
-            vmax = float(np.percentile(valid_data, 98))
-        
-        # Ensure vmin < vmax
-        if np.isnan(vmin) or np.isnan(vmax) or vmin >= vmax:
-            vmin = float(np.nanmin(data_upsampled))
-            vmax = float(np.nanmax(data_upsampled))
-            if np.isnan(vmin) or np.isnan(vmax) or vmin >= vmax:
-                vmax = vmin + 0.01 if not np.isnan(vmin) else 1.0
-                vmin = 0.0 if np.isnan(vmin) else vmin
-        
-        if not (vmin < vmax):
-            vmin = 0.0
-            vmax = 1.0
-        
-        norm = colors.Normalize(vmin=vmin, vmax=vmax)
-        
-        # Apply colormap
-        cmap = cm.get_cmap(colormap_name)
-        data_normalized = np.nan_to_num(data_upsampled, nan=vmin)
-        rgba_array = (cmap(norm(data_normalized)) * 255).astype(np.uint8)
-        
-        # Add ImageOverlay
-        bounds = [[lat_min, lon_min], [lat_max, lon_max]]
-        folium.raster_layers.ImageOverlay(
-            image=rgba_array,
-            bounds=bounds,
-            opacity=0.65,
-            interactive=True,
-            name='Heatmap'
-        ).add_to(m)
-        
+            if not _add_image_overlay(m, data_values, variable, colormap_name,
+                                      [[lat_min, lon_min], [lat_max, lon_max]]):
+                return m
+
         # Add warning if significant data is missing
         if nan_percentage > 30:
             html_msg = f"""
@@ -236,180 +518,190 @@ def create_interactive_map(risk_data, data_slice, variable='risk_index', date=No
         # )
         # linear_colormap.add_to(m)
         
-        # Add marker points
-        for i, lat in enumerate(data_to_plot.latitude.values[::2]):
-            for j, lon in enumerate(data_to_plot.longitude.values[::2]):
-                try:
-                    val = float(data_to_plot.sel(latitude=lat, longitude=lon, method='nearest').values)
-                    risk_val = float(risk_data['risk'].sel(latitude=lat, longitude=lon, method='nearest').values)
-                    temp_val = float(risk_data['temperature'].sel(latitude=lat, longitude=lon, method='nearest').values)
-                    rh_val = float(risk_data['relative_humidity'].sel(latitude=lat, longitude=lon, method='nearest').values)
-                    
-                    if not np.isnan(val):
-                        popup_html = f"""
-                        <div style="font-family: Arial; width: 220px;">
-                            <h4 style="margin:0; color: #2c3e50;">📍 Punto de Medición</h4>
-                            <hr style="margin: 5px 0;">
-                            <b>Coordenadas:</b> {lat:.2f}, {lon:.2f}<br>
-                            <b style="color: {get_color(risk_val)};">🔥 Riesgo:</b> {risk_val:.2f}<br>
-                            <b>🌡️ Temperatura:</b> {temp_val:.1f}°C<br>
-                            <b>💧 Humedad:</b> {rh_val:.1f}%<br>
-                        </div>
-                        """
-                        
-                        folium.CircleMarker(
-                            location=[lat, lon],
-                            radius=5,
-                            popup=folium.Popup(popup_html, max_width=250),
-                            color='white',
-                            fill=True,
-                            fillColor=get_color(val, variable),
-                            fillOpacity=0.8,
-                            weight=1
-                        ).add_to(m)
-                except:
-                    pass
+        # Add marker points; all four grids are extracted once as plain
+        # ndarrays so the loop does no xarray index lookups at all
+        lats_sub = data_to_plot.latitude.values[::2]
+        lons_sub = data_to_plot.longitude.values[::2]
+        vals_sub = data_to_plot.values[::2, ::2]
+        risk_sub = risk_data['risk'].values[::2, ::2]
+        temp_sub = risk_data['temperature'].values[::2, ::2]
+        rh_sub = risk_data['relative_humidity'].values[::2, ::2]
+
+        # Colors for the whole grid in two searchsorted calls
+        fill_colors = get_colors(vals_sub, variable)
+        risk_colors = get_colors(risk_sub, 'risk_index')
+
+        # Visit only the valid cells: NaN cells used to burn a Python
+        # exception per iteration just to be skipped
+        points = []
+        ii, jj = np.where(~np.isnan(vals_sub))
+        for i, j in zip(ii, jj):
+            lat = float(lats_sub[i])
+            lon = float(lons_sub[j])
+            risk_val = float(risk_sub[i, j])
+            temp_val = float(temp_sub[i, j])
+            rh_val = float(rh_sub[i, j])
+
+            popup_html = _MARKER_TPL % (lat, lon, risk_colors[i, j],
+                                        risk_val, temp_val, rh_val)
+
+            points.append({
+                'lat': lat,
+                'lon': lon,
+                'color': str(fill_colors[i, j]),
+                'popup': popup_html
+            })
+
+        if points:
+            m.add_child(BulkCircleMarkers(points))
         
         # Add wind arrows
         if variable == 'wind_speed':
-            for lat in data_to_plot.latitude.values[::2]:
-                for lon in data_to_plot.longitude.values[::2]:
-                    try:
-                        u = float(risk_data['wind_u'].sel(latitude=lat, longitude=lon, method='nearest').values)
-                        v = float(risk_data['wind_v'].sel(latitude=lat, longitude=lon, method='nearest').values)
-                        
-                        if not (np.isnan(u) or np.isnan(v)):
-                            magnitude = np.sqrt(u**2 + v**2)
-                            arrow_length = 0.06 * (1 + magnitude / 10)
-                            
-                            end_lat = lat + v * arrow_length
-                            end_lon = lon + u * arrow_length
-                            
-                            folium.PolyLine(
-                                locations=[[lat, lon], [end_lat, end_lon]],
-                                color='#FF6B35',
-                                weight=4,
-                                opacity=0.9
-                            ).add_to(m)
-                            
-                            angle = np.arctan2(v, u)
-                            arrow_angle = 30 * np.pi / 180
-                            arrow_size = arrow_length * 0.3
-                            
-                            left_lat = end_lat - arrow_size * np.sin(angle + arrow_angle)
-                            left_lon = end_lon - arrow_size * np.cos(angle + arrow_angle)
-                            
-                            right_lat = end_lat - arrow_size * np.sin(angle - arrow_angle)
-                            right_lon = end_lon - arrow_size * np.cos(angle - arrow_angle)
-                            
-                            folium.PolyLine(
-                                locations=[[end_lat, end_lon], [left_lat, left_lon]],
-                                color='#FF6B35',
-                                weight=4,
-                                opacity=0.9
-                            ).add_to(m)
-                            
-                            folium.PolyLine(
-                                locations=[[end_lat, end_lon], [right_lat, right_lon]],
-                                color='#FF6B35',
-                                weight=4,
-                                opacity=0.9
-                            ).add_to(m)
-                    except:
-                        pass
+            # All arrow geometry is computed in one vectorized pass; the
+            # loop below only instantiates folium objects
+            u_sub = risk_data['wind_u'].values[::2, ::2]
+            v_sub = risk_data['wind_v'].values[::2, ::2]
+            lat_grid, lon_grid = np.meshgrid(lats_sub, lons_sub, indexing='ij')
+
+            valid = ~(np.isnan(u_sub) | np.isnan(v_sub))
+            u_arr = u_sub[valid]
+            v_arr = v_sub[valid]
+            lat_arr = lat_grid[valid]
+            lon_arr = lon_grid[valid]
+
+            magnitude = np.hypot(u_arr, v_arr)
+            arrow_length = 0.06 * (1 + magnitude / 10)
+            end_lat = lat_arr + v_arr * arrow_length
+            end_lon = lon_arr + u_arr * arrow_length
+
+            angle = np.arctan2(v_arr, u_arr)
+            arrow_angle = 30 * np.pi / 180
+            arrow_size = arrow_length * 0.3
+            left_lat = end_lat - arrow_size * np.sin(angle + arrow_angle)
+            left_lon = end_lon - arrow_size * np.cos(angle + arrow_angle)
+            right_lat = end_lat - arrow_size * np.sin(angle - arrow_angle)
+            right_lon = end_lon - arrow_size * np.cos(angle - arrow_angle)
+
+            for k in range(u_arr.size):
+                folium.PolyLine(
+                    locations=[[lat_arr[k], lon_arr[k]], [end_lat[k], end_lon[k]]],
+                    color='#FF6B35',
+                    weight=4,
+                    opacity=0.9
+                ).add_to(m)
+
+                folium.PolyLine(
+                    locations=[[end_lat[k], end_lon[k]], [left_lat[k], left_lon[k]]],
+                    color='#FF6B35',
+                    weight=4,
+                    opacity=0.9
+                ).add_to(m)
+
+                folium.PolyLine(
+                    locations=[[end_lat[k], end_lon[k]], [right_lat[k], right_lon[k]]],
+                    color='#FF6B35',
+                    weight=4,
+                    opacity=0.9
+                ).add_to(m)
         # Add fire markers if enabled - FILTER BY SELECTED MONTH/YEAR
         if show_fires and fires_data is not None and len(fires_data) > 0 and date is not None:
             # Extract year and month from selected date
             selected_year = date.year
             selected_month = date.month
             
-            # Filter fires for selected month and year
-            fires_filtered = fires_data[
-                (fires_data['fecha'].dt.year == selected_year) &
-                (fires_data['fecha'].dt.month == selected_month)
-            ]
+            # Filter fires for selected month and year (pre-grouped lookup)
+            fires_filtered = _fires_for_month(fires_data, selected_year, selected_month)
             
             print(f"DEBUG: Showing {len(fires_filtered)} fires for {selected_year}-{selected_month:02d}")
-            
-            for idx, fire in fires_filtered.iterrows():
+
+            # One vectorized lookup for every fire's weather instead of
+            # five .sel round-trips per fire
+            fire_weather = None
+            if dataset is not None and len(fires_filtered) > 0:
                 try:
-                    fire_lat = fire['lat']
-                    fire_lng = fire['lng']
-                    fire_date = fire['fecha']
-                    fire_size = fire['superficie']
-                    
-                    # Scale marker size and opacity based on fire size
-                    radius = min(8 + (fire_size / 10), 25)
-                    opacity = min(0.4 + (fire_size / 200), 0.9)
-                    
-                    # Try to get weather data for the fire date
-                    weather_info = ""
-                    if dataset is not None:
-                        try:
-                            fire_data_slice = dataset.sel({date_key: fire_date}, method='nearest', tolerance='30D')
-                            
-                            # Get weather data at fire location
-                            fire_temp = float(fire_data_slice['t2m'].sel(
-                                latitude=fire_lat, longitude=fire_lng, method='nearest'
-                            ).values) - 273.15
-                            
-                            fire_u = float(fire_data_slice['u10'].sel(
-                                latitude=fire_lat, longitude=fire_lng, method='nearest'
-                            ).values)
-                            fire_v = float(fire_data_slice['v10'].sel(
-                                latitude=fire_lat, longitude=fire_lng, method='nearest'
-                            ).values)
-                            fire_wind = np.sqrt(fire_u**2 + fire_v**2)
-                            
-                            fire_d2m = float(fire_data_slice['d2m'].sel(
-                                latitude=fire_lat, longitude=fire_lng, method='nearest'
-                            ).values)
-                            
-                            # Calculate relative humidity
-                            t_c = fire_temp
-                            d_c = fire_d2m - 273.15
-                            fire_rh = 100 * (np.exp((17.625 * d_c) / (243.04 + d_c)) / 
-                                           np.exp((17.625 * t_c) / (243.04 + t_c)))
-                            fire_rh = np.clip(fire_rh, 0, 100)
-                            
-                            weather_info = f"""
-                            <hr style="margin: 8px 0;">
-                            <b>📊 Datos Meteorológicos ({fire_date.strftime('%Y-%m-%d')})</b><br>
-                            <b>🌡️ Temperatura:</b> {fire_temp:.1f}°C<br>
-                            <b>💧 Humedad:</b> {fire_rh:.1f}%<br>
-                            <b>💨 Viento:</b> {fire_wind:.1f} m/s
-                            """
-                        except Exception as weather_error:
-                            weather_info = f"<hr><small>Datos meteorológicos no disponibles</small>"
-                    
-                    # Create popup with fire info
-                    popup_html = f"""
-                    <div style="font-family: Arial; width: 250px;">
-                        <h4 style="margin:0; color: #e74c3c;">🔥 Incendio Histórico</h4>
-                        <hr style="margin: 5px 0;">
-                        <b>📅 Fecha:</b> {fire_date.strftime('%d/%m/%Y')}<br>
-                        <b>📍 Ubicación:</b> {fire_lat:.3f}, {fire_lng:.3f}<br>
-                        <b>🌲 Superficie quemada:</b> {fire_size:.1f} ha
-                        {weather_info}
-                    </div>
-                    """
-                    
-                    # Add fire marker with pulsing effect
-                    folium.CircleMarker(
-                        location=[fire_lat, fire_lng],
-                        radius=radius,
-                        popup=folium.Popup(popup_html, max_width=280),
-                        tooltip=f"🔥 {fire_size:.0f}ha - {fire_date.strftime('%d/%m/%Y')}",
-                        color='#d63031',
-                        fill=True,
-                        fillColor='#ff7675',
-                        fillOpacity=opacity,
-                        weight=2
-                    ).add_to(m)
-                    
-                except Exception as fire_error:
-                    print(f"Error adding fire marker: {fire_error}")
-                    pass
+                    fire_dates = pd.to_datetime(fires_filtered['fecha'].values)
+                    points = dataset[['t2m', 'u10', 'v10', 'd2m']].sel({
+                        date_key: xr.DataArray(fire_dates, dims='f'),
+                        'latitude': xr.DataArray(fires_filtered['lat'].to_numpy(), dims='f'),
+                        'longitude': xr.DataArray(fires_filtered['lng'].to_numpy(), dims='f'),
+                    }, method='nearest')
+
+                    # Honour the old per-fire 30-day tolerance
+                    matched = pd.to_datetime(points[date_key].values)
+                    in_range = np.abs(matched - fire_dates) <= pd.Timedelta('30D')
+
+                    fire_temp_all = points['t2m'].values - 273.15
+                    fire_wind_all = np.hypot(points['u10'].values, points['v10'].values)
+                    # exp(a)/exp(b) folded to exp(a-b): one exp pass over
+                    # the fire batch instead of two
+                    d_c_all = points['d2m'].values - 273.15
+                    fire_rh_all = np.clip(
+                        100.0 * np.exp((17.625 * d_c_all) / (243.04 + d_c_all)
+                                       - (17.625 * fire_temp_all) / (243.04 + fire_temp_all)),
+                        0.0, 100.0)
+                    fire_weather = (np.asarray(in_range), fire_temp_all,
+                                    fire_rh_all, fire_wind_all)
+                except Exception as weather_error:
+                    print(f"Error precomputing fire weather: {weather_error}")
+
+            # No try/except in the loop: the rows are pre-filtered and
+            # the batched weather carries NaN for misses, so a cheap
+            # isnan guard replaces per-iteration exception frames
+            for k, fire in enumerate(fires_filtered.itertuples(index=False)):
+                fire_lat = fire.lat
+                fire_lng = fire.lng
+                fire_date = fire.fecha
+                fire_size = fire.superficie
+
+                # Scale marker size and opacity based on fire size
+                radius = min(8 + (fire_size / 10), 25)
+                opacity = min(0.4 + (fire_size / 200), 0.9)
+
+                # Weather for this fire comes out of the batched lookup
+                weather_info = ""
+                if dataset is not None:
+                    if (fire_weather is not None and fire_weather[0][k]
+                            and not np.isnan(fire_weather[1][k])
+                            and not np.isnan(fire_weather[2][k])
+                            and not np.isnan(fire_weather[3][k])):
+                        fire_temp = float(fire_weather[1][k])
+                        fire_rh = float(fire_weather[2][k])
+                        fire_wind = float(fire_weather[3][k])
+
+                        weather_info = f"""
+                        <hr style="margin: 8px 0;">
+                        <b>📊 Datos Meteorológicos ({fire_date.strftime('%Y-%m-%d')})</b><br>
+                        <b>🌡️ Temperatura:</b> {fire_temp:.1f}°C<br>
+                        <b>💧 Humedad:</b> {fire_rh:.1f}%<br>
+                        <b>💨 Viento:</b> {fire_wind:.1f} m/s
+                        """
+                    else:
+                        weather_info = f"<hr><small>Datos meteorológicos no disponibles</small>"
+
+                # Create popup with fire info
+                popup_html = f"""
+                <div style="font-family: Arial; width: 250px;">
+                    <h4 style="margin:0; color: #e74c3c;">🔥 Incendio Histórico</h4>
+                    <hr style="margin: 5px 0;">
+                    <b>📅 Fecha:</b> {fire_date.strftime('%d/%m/%Y')}<br>
+                    <b>📍 Ubicación:</b> {fire_lat:.3f}, {fire_lng:.3f}<br>
+                    <b>🌲 Superficie quemada:</b> {fire_size:.1f} ha
+                    {weather_info}
+                </div>
+                """
+
+                # Add fire marker with pulsing effect
+                folium.CircleMarker(
+                    location=[fire_lat, fire_lng],
+                    radius=radius,
+                    popup=folium.Popup(popup_html, max_width=280),
+                    tooltip=f"🔥 {fire_size:.0f}ha - {fire_date.strftime('%d/%m/%Y')}",
+                    color='#d63031',
+                    fill=True,
+                    fillColor='#ff7675',
+                    fillOpacity=opacity,
+                    weight=2
+                ).add_to(m)
             
             # Add info message if fires shown
             if len(fires_filtered) > 0:
@@ -1,6 +1,148 @@
+import math
+
 import numpy as np
+import xarray as xr
 import data_processor as dp
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # numba is optional; the plain NumPy paths below are the fallback
+    NUMBA_AVAILABLE = False
+
+try:
+    from crick import TDigest
+    TDIGEST_AVAILABLE = True
+except ImportError:
+    # crick is optional; exact quantiles are the fallback
+    TDIGEST_AVAILABLE = False
+
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    # numexpr is optional; the plain NumPy expression is the fallback
+    NUMEXPR_AVAILABLE = False
+
+# Full fastmath implies nnan/ninf, which licenses LLVM to assume no
+# NaNs and fold the np.isnan guards in the kernels below to false; this
+# subset keeps the profitable fma/reassociation flags without that
+_FASTMATH_FLAGS = {'contract', 'reassoc', 'nsz', 'arcp'}
+
+# Above this many risk values, the global quantiles stream through a
+# t-digest chunk by chunk instead of materializing the whole cube
+_TDIGEST_STREAM_SIZE = 50_000_000
+
+# Full-cube risk results keyed by dataset identity: the global
+# threshold and the risk time series both derive risk from the same
+# long-lived dataset object, so the second caller gets a lookup instead
+# of recomputing the whole (time, lat, lon) cube
+_RISK_INDEX_CACHE = {}
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=_FASTMATH_FLAGS, cache=True)
+    def _risk_kernel(t2m, u10, v10, d2m, swvl1, swvl1_max,
+                     temp_c, rh, ws, risk):
+        """Fully fused per-cell pipeline: unit conversion, wind speed,
+        Magnus RH, the clamped normalizations and the weighted sum run in
+        one pass, writing all four derived grids without temporaries"""
+        for i in prange(t2m.shape[0]):
+            for j in range(t2m.shape[1]):
+                tc = t2m[i, j] - 273.15
+                dc = d2m[i, j] - 273.15
+                w = math.sqrt(u10[i, j] * u10[i, j] + v10[i, j] * v10[i, j])
+                r = (100.0 * math.exp(17.625 * dc / (243.04 + dc))
+                     / math.exp(17.625 * tc / (243.04 + tc)))
+                if r < 0.0:
+                    r = 0.0
+                if r > 100.0:
+                    r = 100.0
+                t_norm = min(max(tc / 40.0, 0.0), 1.0)
+                ws_norm = min(max(w / 15.0, 0.0), 1.0)
+                rh_norm = min(max(1.0 - r / 100.0, 0.0), 1.0)
+                sw_norm = min(max(1.0 - swvl1[i, j] / swvl1_max, 0.0), 1.0)
+                temp_c[i, j] = tc
+                rh[i, j] = r
+                ws[i, j] = w
+                risk[i, j] = (0.4 * t_norm + 0.35 * rh_norm +
+                              0.15 * ws_norm + 0.1 * sw_norm)
+
+    @njit(parallel=True, fastmath=_FASTMATH_FLAGS, cache=True)
+    def _alert_stats(risk, temp, rh, ws, threshold):
+        """NaN-aware sum/sumsq/count for the four grids plus the
+        threshold-crossing count, all in one traversal instead of the
+        eight separate nanmean/nanstd scans"""
+        s0 = 0.0; q0 = 0.0; n0 = 0
+        s1 = 0.0; q1 = 0.0; n1 = 0
+        s2 = 0.0; q2 = 0.0; n2 = 0
+        s3 = 0.0; q3 = 0.0; n3 = 0
+        high = 0
+        for i in prange(risk.size):
+            v = risk[i]
+            if not np.isnan(v):
+                s0 += v; q0 += v * v; n0 += 1
+                if v > threshold:
+                    high += 1
+            v = temp[i]
+            if not np.isnan(v):
+                s1 += v; q1 += v * v; n1 += 1
+            v = rh[i]
+            if not np.isnan(v):
+                s2 += v; q2 += v * v; n2 += 1
+            v = ws[i]
+            if not np.isnan(v):
+                s3 += v; q3 += v * v; n3 += 1
+        return s0, q0, n0, s1, q1, n1, s2, q2, n2, s3, q3, n3, high
+
+    @njit(fastmath=_FASTMATH_FLAGS, cache=True)
+    def _month_kernel(risk, temp, rh, ws, land, use_land, threshold):
+        """One serial sweep per month: the four moment accumulators,
+        the threshold-crossing count and a 10-slot insertion heap for
+        the top land cells, reading each input element exactly once"""
+        s0 = 0.0; q0 = 0.0; n0 = 0
+        s1 = 0.0; q1 = 0.0; n1 = 0
+        s2 = 0.0; q2 = 0.0; n2 = 0
+        s3 = 0.0; q3 = 0.0; n3 = 0
+        high = 0
+        top_idx = np.full(10, -1, np.int64)
+        top_val = np.full(10, -np.inf, np.float64)
+        for i in range(risk.size):
+            v = risk[i]
+            if not np.isnan(v):
+                s0 += v; q0 += v * v; n0 += 1
+                if v > threshold:
+                    high += 1
+                if v >= threshold and (not use_land or land[i]):
+                    if v > top_val[9]:
+                        j = 9
+                        while j > 0 and top_val[j - 1] < v:
+                            top_val[j] = top_val[j - 1]
+                            top_idx[j] = top_idx[j - 1]
+                            j -= 1
+                        top_val[j] = v
+                        top_idx[j] = i
+            v = temp[i]
+            if not np.isnan(v):
+                s1 += v; q1 += v * v; n1 += 1
+            v = rh[i]
+            if not np.isnan(v):
+                s2 += v; q2 += v * v; n2 += 1
+            v = ws[i]
+            if not np.isnan(v):
+                s3 += v; q3 += v * v; n3 += 1
+        return (s0, q0, n0, s1, q1, n1, s2, q2, n2, s3, q3, n3,
+                high, top_idx, top_val)
+
+
+def _mean_std(s, q, n):
+    """Mean and std from the accumulated first two moments"""
+    if n == 0:
+        return float('nan'), float('nan')
+    m = s / n
+    return m, math.sqrt(max(q / n - m * m, 0.0))
+
 def calculate_global_threshold(dataset, date_key='time'):
     """
     Calculate a single global threshold (mean + std) across entire dataset
@@ -19,43 +161,85 @@ def calculate_global_threshold(dataset, date_key='time'):
         Contains global mean, std, and threshold
     """
     print(f"Calculating global risk threshold across all {len(dataset[date_key])} time steps...")
-    
-    all_risk_values = []
-    
-    # Calculate risk for all time steps
-    for time_idx in range(len(dataset[date_key])):
-        try:
-            data_slice = dataset.isel({date_key: time_idx})
-            risk_data = calculate_risk_index(data_slice)
-            
-            risk_values = risk_data['risk'].values
-            valid_risk = risk_values[~np.isnan(risk_values)]
-            all_risk_values.extend(valid_risk.flatten())
-            
-        except Exception as e:
-            print(f"Warning: Could not process time step {time_idx}: {e}")
-            continue
-    
-    if len(all_risk_values) == 0:
+
+    # One broadcasted risk computation over the whole (time, lat, lon)
+    # cube: calculate_risk_index already handles the time dimension, so
+    # the per-timestep Python loop and the list/ndarray round-trip are
+    # gone — NaN-aware reductions do the filtering instead
+    try:
+        risk_da = calculate_risk_index(dataset)['risk']
+    except Exception as e:
+        print(f"ERROR: Could not compute risk over full dataset: {e}")
+        return None
+
+    quantiles = None
+    if risk_da.chunks is not None:
+        # Dask-backed input (e.g. the zarr store): mean/std/count share
+        # one task graph with the risk computation itself and reduce
+        # chunk-parallel across cores with bounded peak memory
+        import dask
+
+        stats = (risk_da.mean(skipna=True), risk_da.std(skipna=True),
+                 risk_da.notnull().sum())
+        if TDIGEST_AVAILABLE and risk_da.size > _TDIGEST_STREAM_SIZE:
+            # Cube too big to hold: stream each chunk through a t-digest
+            # so the quantiles cost O(centroids) memory instead of
+            # O(T*Y*X); the epsilon error is far below the 4-decimal
+            # precision the threshold needs
+            mean_v, std_v, count_v = dask.compute(*stats)
+            td = TDigest()
+            for block in risk_da.data.blocks.ravel():
+                vals = np.asarray(block)
+                vals = vals[~np.isnan(vals)]
+                if vals.size:
+                    td.update(vals)
+            quantiles = (td.quantile(0.5), td.quantile(0.84),
+                         td.quantile(0.95))
+            risk_full = None
+        else:
+            # Exact quantiles cannot reduce across chunks, so this path
+            # materializes the float32 cube (fine at regional sizes)
+            mean_v, std_v, count_v, risk_full = dask.compute(*stats, risk_da)
+            risk_full = risk_full.values
+            # dask.compute returned a fresh buffer nothing else holds
+            risk_full_owned = True
+        global_mean = float(mean_v)
+        global_std = float(std_v)
+        valid_count = int(count_v)
+    else:
+        # .values aliases the cube memoized by calculate_risk_index, so
+        # in-place partitioning below would scramble later cache hits
+        risk_full = risk_da.values
+        risk_full_owned = False
+        # NaN handling stays inside the nan-aware reductions; the count
+        # skips the boolean inversion pass entirely
+        valid_count = risk_full.size - int(np.count_nonzero(np.isnan(risk_full)))
+        global_mean = float(np.nanmean(risk_full))
+        global_std = float(np.nanstd(risk_full))
+
+    if valid_count == 0:
         print("ERROR: No risk data collected for global threshold")
         return None
-    
-    # Calculate global statistics
-    all_risk_array = np.array(all_risk_values)
-    
-    global_mean = float(np.mean(all_risk_array))
-    global_std = float(np.std(all_risk_array))
+
+    if quantiles is None:
+        # One batched quantile call: the expensive partition of the cube
+        # happens once for all three cut points; it runs in place only
+        # when risk_full is a fresh temporary this function owns
+        median, p84, p95 = np.nanquantile(
+            risk_full, [0.5, 0.84, 0.95], overwrite_input=risk_full_owned)
+    else:
+        median, p84, p95 = quantiles
     # global_threshold = global_mean + global_std
-    global_threshold = float(np.percentile(all_risk_array, 84))
-    
+    global_threshold = float(p84)
+
     threshold_info = {
         'mean': global_mean,
         'std': global_std,
         'threshold': global_threshold,
-        'median': float(np.median(all_risk_array)),
-        'p84': float(np.percentile(all_risk_array, 84)),
-        'p95': float(np.percentile(all_risk_array, 95)),
-        'count': len(all_risk_array)
+        'median': float(median),
+        'p84': global_threshold,
+        'p95': float(p95),
+        'count': valid_count
     }
     
     print(f"Global threshold calculated:")
@@ -71,22 +255,25 @@ def calculate_risk_index(data):
     Calculate fire risk index from multiple variables
     Higher values = higher fire risk
     Uses proper min-max normalization per month
+
+    Accepts a single-month slice or a dataset with a time dimension; in the
+    latter case the computation broadcasts across time in one pass and the
+    soil-moisture normalization stays per-timestep.
     """
-    # Extract variables
-    t2m = data['t2m']  # Temperature
-    u10 = data['u10']  # Wind U component
-    v10 = data['v10']  # Wind V component
-    d2m = data['d2m']  # Dewpoint temperature
-    swvl1 = data['swvl1']  # Soil moisture layer 1
+    cached = dp.ident_cache_get(_RISK_INDEX_CACHE, data)
+    if cached is not None:
+        return cached
+
+    # Extract variables. ERA5 stores these as float32; NetCDF decoding
+    # can upcast to float64, which would double every byte the pipeline
+    # moves, so pin the working dtype here (copy=False makes this free
+    # when the store is already float32)
+    t2m = data['t2m'].astype(np.float32, copy=False)  # Temperature
+    u10 = data['u10'].astype(np.float32, copy=False)  # Wind U component
+    v10 = data['v10'].astype(np.float32, copy=False)  # Wind V component
+    d2m = data['d2m'].astype(np.float32, copy=False)  # Dewpoint temperature
+    swvl1 = data['swvl1'].astype(np.float32, copy=False)  # Soil moisture layer 1
 
-    
-    # Calculate derived variables
-    ws = dp.calculate_wind_speed(u10, v10)
-    rh = dp.calculate_relative_humidity(t2m, d2m)
-    
-    # Convert temperature to Celsius
-    temp_c = t2m - 273.15
-    
     # # Normalize variables using min-max normalization [0, 1]
     # # Temperature: 0-40°C range
     # t_norm = np.clip((temp_c - 0) / (40 - 0), 0, 1)
@@ -101,22 +288,91 @@ def calculate_risk_index(data):
     # # Normalizar humedad del suelo entre 0 y 1
     # swvl1_norm = np.clip(1 - (swvl1 / swvl1.max()), 0, 1)
 
-    #cambios realizados
-    # Normalize variables using min-max normalization [0, 1]
-    t_norm = np.clip((temp_c - 0) / (40 - 0), 0, 1)  # <--- CAMBIO: peso alto según PCA
-    ws_norm = np.clip(ws / 15, 0, 1)                 # <--- CAMBIO: peso menor según PCA
-    rh_norm = np.clip(1 - (rh / 100), 0, 1)         # <--- CORRECTO: invertido para riesgo
-    swvl1_norm = np.clip(1 - (swvl1 / swvl1.max()), 0, 1)  # <--- NUEVO: añadir según PCA
-    
-    # Calculate weighted risk index
-    # Aquí reemplazas tu anterior 0.34/0.33/0.33 con los pesos ajustados.
-    # Weights: Temperature (40%), Wind (15%), Humidity (35%), humedad suelo (10%)
-    risk = (
-        0.4 * t_norm +      # <--- CAMBIO: mayor peso a temperatura
-        0.35 * rh_norm +    # <--- CAMBIO: humedad relativa
-        0.15 * ws_norm +    # <--- CAMBIO: viento
-        0.1 * swvl1_norm    # <--- CAMBIO: humedad suelo
-    )
+    # Per-timestep soil-moisture max so batched calls keep the same
+    # normalization as single-slice calls
+    spatial_dims = [d for d in swvl1.dims if d in ('latitude', 'longitude')]
+    swvl1_max = swvl1.max(dim=spatial_dims)
+
+    if NUMBA_AVAILABLE and t2m.ndim == 2:
+        # Fully fused compiled kernel: unit conversion, wind speed,
+        # Magnus RH, clamps and the weighted sum happen in one
+        # machine-code pass that also yields the derived grids below
+        shape = t2m.shape
+        temp_v = np.empty(shape, np.float32)
+        rh_v = np.empty(shape, np.float32)
+        ws_v = np.empty(shape, np.float32)
+        risk_v = np.empty(shape, np.float32)
+        _risk_kernel(
+            np.ascontiguousarray(t2m.values, dtype=np.float32),
+            np.ascontiguousarray(u10.values, dtype=np.float32),
+            np.ascontiguousarray(v10.values, dtype=np.float32),
+            np.ascontiguousarray(d2m.values, dtype=np.float32),
+            np.ascontiguousarray(swvl1.values, dtype=np.float32),
+            float(swvl1_max),
+            temp_v, rh_v, ws_v, risk_v,
+        )
+        temp_c = xr.DataArray(temp_v, coords=t2m.coords, dims=t2m.dims)
+        rh = xr.DataArray(rh_v, coords=t2m.coords, dims=t2m.dims)
+        ws = xr.DataArray(ws_v, coords=t2m.coords, dims=t2m.dims)
+        risk = xr.DataArray(risk_v, coords=t2m.coords, dims=t2m.dims)
+    else:
+        # Derived variables: prefer the fields baked into the zarr store
+        # at build time (the Magnus RH in particular costs a
+        # transcendental per cell), else compute them here
+        if 'ws' in data:
+            ws = data['ws'].astype(np.float32, copy=False)
+        else:
+            ws = dp.calculate_wind_speed(u10, v10)
+        if 'rh' in data:
+            rh = data['rh'].astype(np.float32, copy=False)
+        else:
+            rh = dp.calculate_relative_humidity(t2m, d2m)
+
+        # Convert temperature to Celsius
+        temp_c = t2m - 273.15
+
+        if NUMEXPR_AVAILABLE and isinstance(temp_c.data, np.ndarray):
+            # numexpr compiles the clip + weighted-sum chain into one
+            # multi-threaded pass with a single output buffer instead of
+            # an intermediate array per operator. Only taken for eager
+            # arrays: dask inputs must stay lazy for the chunked
+            # threshold reductions
+            tc = temp_c.values
+            rhv = np.asarray(rh.values if isinstance(rh, xr.DataArray) else rh)
+            wsv = np.asarray(ws.values if isinstance(ws, xr.DataArray) else ws)
+            swv = swvl1.values
+            swm = np.asarray(swvl1_max.values)
+            if swm.ndim:
+                # Per-timestep maxima broadcast over the grid
+                swm = swm.reshape(swm.shape + (1, 1))
+            # Weights: Temperature (40%), Humidity (35%), Wind (15%),
+            # humedad suelo (10%) — same clamps as the numba kernel
+            risk_values = ne.evaluate(
+                "0.4 * where(tc < 0.0, 0.0, where(tc > 40.0, 1.0, tc / 40.0))"
+                " + 0.35 * where(rhv > 100.0, 0.0,"
+                "               where(rhv < 0.0, 1.0, 1.0 - rhv / 100.0))"
+                " + 0.15 * where(wsv > 15.0, 1.0, wsv / 15.0)"
+                " + 0.1 * where(swv > swm, 0.0,"
+                "              where(swv < 0.0, 1.0, 1.0 - swv / swm))")
+            risk = xr.DataArray(risk_values, coords=temp_c.coords,
+                                dims=temp_c.dims)
+        else:
+            #cambios realizados
+            # Normalize variables using min-max normalization [0, 1]
+            t_norm = np.clip((temp_c - 0) / (40 - 0), 0, 1)  # <--- CAMBIO: peso alto según PCA
+            ws_norm = np.clip(ws / 15, 0, 1)                 # <--- CAMBIO: peso menor según PCA
+            rh_norm = np.clip(1 - (rh / 100), 0, 1)         # <--- CORRECTO: invertido para riesgo
+            swvl1_norm = np.clip(1 - (swvl1 / swvl1_max), 0, 1)  # <--- NUEVO: añadir según PCA
+
+            # Calculate weighted risk index
+            # Aquí reemplazas tu anterior 0.34/0.33/0.33 con los pesos ajustados.
+            # Weights: Temperature (40%), Wind (15%), Humidity (35%), humedad suelo (10%)
+            risk = (
+                0.4 * t_norm +      # <--- CAMBIO: mayor peso a temperatura
+                0.35 * rh_norm +    # <--- CAMBIO: humedad relativa
+                0.15 * ws_norm +    # <--- CAMBIO: viento
+                0.1 * swvl1_norm    # <--- CAMBIO: humedad suelo
+            )
 
     
     # Extract solar radiation if available
@@ -124,16 +380,23 @@ def calculate_risk_index(data):
     if 'ssrd' in data:
         solar_rad = data['ssrd'] / 1e6  # Convert J/m² to MJ/m²
     
-    return {
-        'risk': risk,
-        'temperature': temp_c,
-        'wind_speed': ws,
-        'relative_humidity': rh,
+    # Keep derived grids in float32 so downstream reductions move half the bytes
+    result = {
+        'risk': risk.astype(np.float32, copy=False),
+        'temperature': temp_c.astype(np.float32, copy=False),
+        'wind_speed': ws.astype(np.float32, copy=False),
+        'relative_humidity': rh.astype(np.float32, copy=False),
         'soil_moisture': swvl1,
         'wind_u': u10,
         'wind_v': v10,
         'solar_radiation': solar_rad
     }
+    # Only full-cube calls are memoized: those come from long-lived
+    # dataset objects, while per-month slices are transient (their ids
+    # get recycled) and are already cached by the app layer
+    if t2m.ndim > 2:
+        dp.ident_cache_put(_RISK_INDEX_CACHE, data, result)
+    return result
 
 
 def calculate_alerts(risk_data, global_threshold_info=None):
@@ -151,28 +414,36 @@ def calculate_alerts(risk_data, global_threshold_info=None):
     temp = risk_data['temperature'].values
     rh = risk_data['relative_humidity'].values
     ws = risk_data['wind_speed'].values
-    
-    # Calculate statistics for current month
-    avg_temp = float(np.nanmean(temp))
-    avg_rh = float(np.nanmean(rh))
-    avg_wind = float(np.nanmean(ws))
-    avg_risk = float(np.nanmean(risk))
-    
-    std_temp = float(np.nanstd(temp))
-    std_rh = float(np.nanstd(rh))
-    std_wind = float(np.nanstd(ws))
-    std_risk = float(np.nanstd(risk))
-    
-    # Use global threshold if available, otherwise use local
-    if global_threshold_info is not None:
-        risk_threshold = global_threshold_info['threshold']
-        global_mean = global_threshold_info['mean']
-        global_std = global_threshold_info['std']
+
+    high_risk_count = None
+    if NUMBA_AVAILABLE:
+        # One fused traversal of the four grids (eight separate
+        # nanmean/nanstd scans otherwise); the threshold crossings are
+        # counted in the same pass when the global threshold is known
+        thr = (global_threshold_info['threshold']
+               if global_threshold_info is not None else np.inf)
+        (s0, q0, n0, s1, q1, n1,
+         s2, q2, n2, s3, q3, n3, high) = _alert_stats(
+            np.ravel(risk), np.ravel(temp), np.ravel(rh), np.ravel(ws), thr)
+        avg_risk, std_risk = _mean_std(s0, q0, n0)
+        avg_temp, std_temp = _mean_std(s1, q1, n1)
+        avg_rh, std_rh = _mean_std(s2, q2, n2)
+        avg_wind, std_wind = _mean_std(s3, q3, n3)
+        if global_threshold_info is not None:
+            high_risk_count = int(high)
     else:
-        risk_threshold = avg_risk + std_risk
-        global_mean = avg_risk
-        global_std = std_risk
+        # Calculate statistics for current month
+        avg_temp = float(np.nanmean(temp))
+        avg_rh = float(np.nanmean(rh))
+        avg_wind = float(np.nanmean(ws))
+        avg_risk = float(np.nanmean(risk))
+
+        std_temp = float(np.nanstd(temp))
+        std_rh = float(np.nanstd(rh))
+        std_wind = float(np.nanstd(ws))
+        std_risk = float(np.nanstd(risk))
 
+    # Use global threshold if available, otherwise use local
     if global_threshold_info is not None:
         # <--- CAMBIO SUGERIDO: usar percentil 84-95 en vez de mean+std si deseas ser más conservador
         risk_threshold = global_threshold_info['threshold']
@@ -183,9 +454,10 @@ def calculate_alerts(risk_data, global_threshold_info=None):
         global_mean = avg_risk
         global_std = std_risk
 
-    
-    # Count points exceeding threshold
-    high_risk_count = int(np.sum(risk > risk_threshold))
+    # Count points exceeding threshold (already counted in the fused
+    # pass when the global threshold was available)
+    if high_risk_count is None:
+        high_risk_count = int(np.sum(risk > risk_threshold))
     
     alerts = {
         'avg_temp': avg_temp,
@@ -205,25 +477,30 @@ def calculate_alerts(risk_data, global_threshold_info=None):
     return alerts
 
 
-def identify_high_risk_regions(risk_data, alerts, data_slice=None):
+def identify_high_risk_regions(risk_data, alerts, land_mask=None,
+                               return_soa=False):
     """
     Identify specific geographic regions with high fire risk
     Uses GLOBAL threshold that's consistent across all months
     Filters out ocean/sea points using land-sea mask
-    
+
     Parameters:
     -----------
     risk_data : dict
         Dictionary containing risk, temperature, humidity, etc. arrays
     alerts : dict
         Alert statistics containing global threshold
-    data_slice : xarray.Dataset (optional)
-        Original data slice containing land-sea mask
-    
+    land_mask : numpy.ndarray of bool (optional)
+        Precomputed boolean land mask (True = land), shared across months
+    return_soa : bool
+        When True, return a dict of column arrays instead of a list of
+        dicts — plotting libraries consume those directly and JSON
+        serialization is one tolist() per key
+
     Returns:
     --------
-    list of dict
-        List of high-risk regions with their coordinates and conditions
+    list of dict, or dict of numpy.ndarray when return_soa=True
+        Top high-risk regions with their coordinates and conditions
     """
     risk = risk_data['risk']
     temp = risk_data['temperature']
@@ -237,11 +514,8 @@ def identify_high_risk_regions(risk_data, alerts, data_slice=None):
     
     print(f"Using GLOBAL threshold = {threshold:.3f} (mean={global_mean:.3f}, std={global_std:.3f})")
     
-    # Get land-sea mask if available
-    land_mask = None
-    if data_slice is not None and 'lsm' in data_slice:
-        land_mask = data_slice['lsm'].values
-        print(f"Land-sea mask found: shape={land_mask.shape}, min={land_mask.min():.3f}, max={land_mask.max():.3f}")
+    if land_mask is not None:
+        print(f"Land-sea mask provided: shape={land_mask.shape}, {int(land_mask.sum())} land cells")
     else:
         print("Warning: No land-sea mask found, all points will be considered")
     
@@ -254,46 +528,159 @@ def identify_high_risk_regions(risk_data, alerts, data_slice=None):
         lons = risk.lon.values
     else:
         print("No coordinates found in risk data")
-        return []
+        return {} if return_soa else []
     
-    # Find high-risk points
-    high_risk_mask = risk.values >= threshold
-    high_risk_mask = risk.values >= threshold 
-    
-    # Add land mask filter (land > 0.5)
+    # Find high-risk points; .values is bound once and reused below
+    risk_vals = risk.values
+    high_risk_mask = risk_vals >= threshold
+
+
+    # Add land mask filter (mask is already boolean, derived once per
+    # dataset by the caller since lsm is time-invariant)
     if land_mask is not None:
-        land_only_mask = land_mask > 0.5
-        # Combine: high risk AND on land
-        combined_mask = high_risk_mask & land_only_mask
-        print(f"Filtering ocean points: {np.sum(high_risk_mask)} high-risk total, {np.sum(combined_mask)} on land")
+        # Combine: high risk AND on land, in place — no per-call
+        # boolean temporary for a mask that runs every month
+        total_high = int(np.sum(high_risk_mask))
+        combined_mask = np.logical_and(high_risk_mask, land_mask,
+                                       out=high_risk_mask)
+        print(f"Filtering ocean points: {total_high} high-risk total, {np.sum(combined_mask)} on land")
     else:
         combined_mask = high_risk_mask
     
-    alert_regions = []
-    
-    # Extract coordinates and values for ALL high-risk LAND points
-    for i in range(len(lats)):
-        for j in range(len(lons)):
-            if combined_mask[i, j] and not np.isnan(risk.values[i, j]):
-                # Calculate z-score using GLOBAL statistics
-                z_score = (risk.values[i, j] - global_mean) / global_std if global_std > 0 else 0
-                
-                alert_regions.append({
-                    'lat': float(lats[i]),
-                    'lon': float(lons[j]),
-                    'risk': float(risk.values[i, j]),
-                    'temperature': float(temp.values[i, j]),
-                    'humidity': float(rh.values[i, j]),
-                    'wind_speed': float(ws.values[i, j]),
-                    'threshold': threshold,
-                    'deviation': float(risk.values[i, j] - global_mean),
-                    'z_score': float(z_score)
-                })
-    
-    # Sort by risk level (highest first)
-    alert_regions.sort(key=lambda x: x['risk'], reverse=True)
-    
-    print(f"Found {len(alert_regions)} high-risk LAND regions above GLOBAL threshold {threshold:.3f}")
+    # One flat pass: masked-out and NaN cells become -inf so the top-k
+    # argpartition works on the raw grid — no per-hit index arrays are
+    # ever materialized, and the per-variable gathers below touch only
+    # the ten winning cells
+    valid = np.isnan(risk_vals)
+    np.logical_not(valid, out=valid)
+    np.logical_and(combined_mask, valid, out=valid)
+    n_hits = int(np.count_nonzero(valid))
+
+    risk_flat = np.where(valid, risk_vals, -np.inf).ravel()
+    k = min(10, n_hits)
+    if k > 0:
+        # O(N) argpartition pulls the candidates, then only those ten
+        # are sorted — no full O(N log N) sort of all masked cells
+        top = np.argpartition(-risk_flat, k - 1)[:k]
+        order = top[np.argsort(-risk_flat[top])]
+    else:
+        order = np.empty(0, dtype=np.intp)
+    ii, jj = np.divmod(order, risk_vals.shape[1])
+
+    rv = risk_vals[ii, jj]
+    tv = temp.values[ii, jj]
+    hv = rh.values[ii, jj]
+    wv = ws.values[ii, jj]
+    # Branch on the std once, outside the array math: one multiply by
+    # the hoisted reciprocal instead of a per-cell divide
+    inv_std = 1.0 / global_std if global_std > 0 else 0.0
+    zv = (rv - global_mean) * inv_std
+
+    print(f"Found {n_hits} high-risk LAND regions above GLOBAL threshold {threshold:.3f}")
+
+    if return_soa:
+        # Struct-of-arrays: one short column per field, no per-region
+        # dict construction or scalar boxing
+        return {
+            'lat': lats[ii],
+            'lon': lons[jj],
+            'risk': rv,
+            'temperature': tv,
+            'humidity': hv,
+            'wind_speed': wv,
+            'threshold': threshold,
+            'deviation': rv - global_mean,
+            'z_score': zv,
+        }
 
     # Return top 10 to avoid map clutter
-    return alert_regions[:10] if len(alert_regions) > 10 else alert_regions
+    return [{
+        'lat': float(lats[ii[k]]),
+        'lon': float(lons[jj[k]]),
+        'risk': float(rv[k]),
+        'temperature': float(tv[k]),
+        'humidity': float(hv[k]),
+        'wind_speed': float(wv[k]),
+        'threshold': threshold,
+        'deviation': float(rv[k] - global_mean),
+        'z_score': float(zv[k])
+    } for k in range(rv.size)]
+
+
+def process_month(risk_data, global_threshold_info, land_mask=None):
+    """
+    Fused alerts + high-risk regions for one month
+
+    Produces the same (alerts, regions) pair as calling calculate_alerts
+    followed by identify_high_risk_regions, but with numba the whole
+    month is one compiled sweep: moments, threshold count and the top-10
+    land cells come out of a single read of each grid instead of the
+    multi-pass pipeline. Falls back to the two separate calls when numba
+    is unavailable or the threshold has to be derived from this month's
+    own statistics.
+    """
+    if not NUMBA_AVAILABLE or global_threshold_info is None:
+        alerts = calculate_alerts(risk_data, global_threshold_info)
+        return alerts, identify_high_risk_regions(risk_data, alerts, land_mask)
+
+    risk = risk_data['risk']
+    temp = risk_data['temperature'].values
+    rh = risk_data['relative_humidity'].values
+    ws = risk_data['wind_speed'].values
+    risk_vals = risk.values
+
+    threshold = global_threshold_info['threshold']
+    global_mean = global_threshold_info['mean']
+    global_std = global_threshold_info['std']
+
+    if land_mask is not None:
+        land_flat = np.ascontiguousarray(land_mask.ravel())
+        use_land = True
+    else:
+        land_flat = np.zeros(1, dtype=np.bool_)
+        use_land = False
+
+    (s0, q0, n0, s1, q1, n1, s2, q2, n2, s3, q3, n3,
+     high, top_idx, top_val) = _month_kernel(
+        np.ravel(risk_vals), np.ravel(temp), np.ravel(rh), np.ravel(ws),
+        land_flat, use_land, threshold)
+
+    avg_risk, std_risk = _mean_std(s0, q0, n0)
+    avg_temp, std_temp = _mean_std(s1, q1, n1)
+    avg_rh, std_rh = _mean_std(s2, q2, n2)
+    avg_wind, std_wind = _mean_std(s3, q3, n3)
+
+    alerts = {
+        'avg_temp': avg_temp,
+        'avg_humidity': avg_rh,
+        'avg_wind': avg_wind,
+        'avg_risk': avg_risk,
+        'std_temp': std_temp,
+        'std_humidity': std_rh,
+        'std_wind': std_wind,
+        'std_risk': std_risk,
+        'risk_threshold': threshold,
+        'global_mean': global_mean,
+        'global_std': global_std,
+        'high_risk_count': int(high)
+    }
+
+    lats = risk.latitude.values
+    lons = risk.longitude.values
+    idx = top_idx[top_idx >= 0]
+    ii, jj = np.divmod(idx, risk_vals.shape[1])
+    inv_std = 1.0 / global_std if global_std > 0 else 0.0
+
+    regions = [{
+        'lat': float(lats[ii[k]]),
+        'lon': float(lons[jj[k]]),
+        'risk': float(risk_vals[ii[k], jj[k]]),
+        'temperature': float(temp[ii[k], jj[k]]),
+        'humidity': float(rh[ii[k], jj[k]]),
+        'wind_speed': float(ws[ii[k], jj[k]]),
+        'threshold': threshold,
+        'deviation': float(risk_vals[ii[k], jj[k]] - global_mean),
+        'z_score': float((risk_vals[ii[k], jj[k]] - global_mean) * inv_std)
+    } for k in range(idx.size)]
+
+    return alerts, regions